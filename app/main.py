@@ -17,14 +17,19 @@ def main():
     with st.sidebar.expander("Import", True):
 
         fileUpload = st.file_uploader('By File Upload', type=['yaml', 'json'], key='file_upload')
+        specUpload = st.file_uploader('Widget Spec (Optional)', type=['yaml', 'json'], key='spec_upload')
 
         # For link sharing feature
         params = st.experimental_get_query_params() # Returns a dict with value(s) as a list 
         if bool(params.get("YAML2URL")):
-            st.success("Shared link found! Imported.")
 
+            # Decoded once; the link's file is shared by every session that opens it
             st.session_state.upload = y2s.urlDecode(params) # For this run
-            st.session_state.link = y2s.urlDecode(params) # For furture run
+            st.session_state.link = st.session_state.upload # For furture run
+            if st.session_state.upload is None:
+                st.error("Shared link could not be read. It may be cut short, or only has the changes of a file.")
+            else:
+                st.success("Shared link found! Imported.")
 
             st.experimental_set_query_params() # Reset URL params
 
@@ -51,20 +56,28 @@ def main():
 
         stObject = st.sidebar # Create a streamlit object for display in the sidebar
 
-        # Export Block
-        with stObject.expander("Export"):
-            if st.button('Generate Export Data'):
-
-                # YAML2ST export
-                y2s.export(st.session_state.upload, st.session_state.df, st, URL)
+        # Export Block, above the parameters. Filled in once the build returns the file's value store
+        exportBlock = stObject.expander("Export")
 
         stObject.title("Parameters")
 
-        # YAML2ST build
-        st.session_state.df = y2s.build(st.session_state.upload, stObject)
+        # YAML2ST build. Returns the value store held in st.session_state['Y2S store'], or None if the file can't be built
+        store = y2s.build(st.session_state.upload, stObject, store=True, spec=specUpload)
+
+        with exportBlock:
+            if st.button('Generate Export Data', disabled=store is None):
+
+                # YAML2ST export, off the script thread. The value store is kept up to date by the widgets' callbacks
+                st.session_state.export = y2s.exportFuture(st.session_state.upload, store, URL)
+                st.session_state.exportDigest = store.digest
+
+            # Draws the download button and share link once the export of this file is done
+            if store is not None and st.session_state.get('export') is not None and st.session_state.get('exportDigest') == store.digest:
+                y2s.drawExport(st.session_state.export, st)
 
         # Display df 
-        st.table(st.session_state.df.astype("str"))
+        if store is not None:
+            st.table(store.toDataFrame(typed=True).astype("str"))
 
 
 if __name__ == '__main__':
@@ -2,37 +2,695 @@ import re
 import ast
 import io
 import os
-import urllib
-import yaml
 import json
-import copy
-import pandas as pd
+import zlib
+import struct
+import sys
+import base64
+import hashlib
+import logging
+import functools
+import gc
+import contextlib
+import contextvars
+import threading
+
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict, namedtuple
+from types import MappingProxyType, SimpleNamespace
+from datetime import datetime, date, time
+from time import perf_counter
 
-from decimal import Decimal
-from dateutil import parser
-from datetime import datetime
 
-try: 
-    from streamlit.uploaded_file_manager import UploadedFile, UploadedFileRec # type: ignore
-except:
-    from streamlit.runtime.uploaded_file_manager import UploadedFile, UploadedFileRec
+PERSISTDECIMAL = True # e.g. if YAML value 0.01 and user wants the value to be 0.001. Keep True for now. 
+SHARELINKCODEC = 'zlib' # The compression of share links: 'zlib', 'lzma', or None for the original uncompressed links
+CLASSIFYCACHESIZE = 65536 # The number of distinct strings whose widget kind is memoized
+FORCECACHESIZE = 4096 # The number of distinct #FORCE directives whose parsed params are memoized
+LAZYMODES = ('expander', 'page') # The modes of build() that draw only the sections the user opens
+PLANCACHESIZE = 32 # The number of compiled build plans kept in memory. Shared by all sessions of the server process.
+LINKCACHESIZE = 64 # The number of decoded share links kept in memory, with their plans and comments. Shared by all sessions.
+LINKCACHEDIR = None # A directory, owned by the server's user and writable only by it, for a disk tier of the decoded share links shared by the server's processes. None for memory only.
+LINKCACHEFILES = 1024 # The number of decoded share links kept in LINKCACHEDIR
+MAXLINKBYTES = 16 * 1024 * 1024 # The largest file a share link decodes to. Larger links are refused.
+EXPORTWORKERS = 4 # The threads of the pool that exportFuture() exports in. Shared by all sessions of the server process.
+EXPORTCACHESIZE = 64 # The number of exports whose results are kept, by the hash of their file and rows
+
+
+# A versioned share link: y2s<version>.<kind><codec>.<base64url payload>
+## kind: 'f' for the full file or 'd' for a delta of changed breadcrumbs against a known base file
+## codec: 'z' for zlib or 'x' for lzma
+SHARELINKVERSION = 2
+SHARELINK = re.compile(r'^y2s(\d+)\.([fd])([zx])\.([A-Za-z0-9_-]*)$')
+LINKERROR = "YAML2ST: The share link is truncated or corrupt."
+
+
+# A binary snapshot of a file's build plan and widget values: a header, a table of sections, then the sections, each 8-byte aligned
+## header: SNAPSHOTMAGIC, the u16 SNAPSHOTVERSION, and the u32 number of sections. A section is its 16-byte name, u64 offset, and u64 length.
+## 'source' is the file's bytes. The int columns are little-endian arrays that are read from a memory map without a copy.
+## The object columns are JSON, with the values JSON doesn't have, e.g. datetimes, as {"$y2s": type, "v": text}, listed in 'fixups'.
+## The path of a step is its 'node' of a table of the paths' keys: the 'nodeParent' and 'nodeKey' of each node but the root, 0.
+## What can be derived isn't stored: a column of meta's 'derived', the kwargs of a widget, made again from its label, params, options,
+##     and value, and the key and breadcrumb of a row of a step, whose index is in 'rowStep'. 'kwargs' only has those of the steps in 
+##     'wholeKwargs', which can't be made again. 'rowKey' and 'rowBreadcrumb' are of the rows of no step, whose rowStep is -1.
+## Version 1 snapshots still load. Their 'path' column has the path of each step, and their 'kwargs' those of every step less the label and key.
+SNAPSHOTMAGIC = b'Y2SNAP'
+SNAPSHOTVERSION = 2
+SNAPSHOTHEADER = struct.Struct('<6sHI')
+SNAPSHOTSECTION = struct.Struct('<16sQQ')
+SNAPSHOTKINDS = ('header', 'hide', 'widget')
+SNAPSHOTARRAYS = {'kind': 'b', 'depth': 'i', 'index': 'i', 'node': 'i', 'nodeParent': 'i', 'rowStep': 'i'} # The int columns and their array typecodes
+SNAPSHOTCOLUMNS = ('key', 'breadcrumb', 'widget', 'label', 'value', 'options', 'params', 'decFormat', 'kwargs', 'error', 'nodeKey',
+                   'rowKey', 'rowValue', 'rowBreadcrumb') # The JSON columns of the steps and rows
+
+
+# A single, immutable step of a compiled build plan. Replaying the steps in order redraws the input widgets.
+## kind: 'header' for a section title, 'hide' for a #FORCE: hide=True param, and 'widget' for an input widget
+## depth: the header level of a 'header' step
+## widget: the streamlit input widget name, i.e. the resolved 'w' param
+## options: the options of a selectbox, radio, select_slider, or multiselect
+## params: the resolved #FORCE params, less the ones YAML2ST consumes, as (name, literal) pairs
+## decFormat: the decimal format enforced on the widget's value, if any
+## kwargs: the read-only keyword arguments of the widget's call
+## error: the text of the widget's call if its params can't be resolved, otherwise ""
+## path: the keys from the top of the file to this key, as strings
+PlanStep = namedtuple('PlanStep', ['kind', 'key', 'breadcrumb', 'depth', 'widget', 'label', 'value', 'options', 'index', 'params', 'decFormat', 'kwargs', 'error', 'path'])
+
+
+# A key of a file as it is streamed by YAML2ST.iterRecords()
+## value: the key's value, or an empty dict for a dict whose keys are the next records
+## line: the line of the key in the file, from 0
+## force: the parsed #FORCE params of the key
+## path: the keys from the top of the file to this key, as strings
+IngestRecord = namedtuple('IngestRecord', ['breadcrumb', 'value', 'line', 'force', 'key', 'path'])
+
+
+# A decoded share link, shared by every session that opens it. Built by YAML2ST.sharedDocument()
+## data: the bytes of the file. digest: their hash, which keys planCache and commentCache
+## plan: its compiled build plan, or None if it isn't a valid file. comments: its CommentIndex
+SharedDocument = namedtuple('SharedDocument', ['data', 'digest', 'plan', 'comments'])
+
+
+# The dispatch table of how each streamlit input widget is called: the arguments YAML2ST resolves for it, besides label, 
+# its #FORCE params, and key. Any widget not listed takes a value.
+WIDGETCALLS = {
+    'selectbox': ('options', 'index'),
+    'radio': ('options', 'index'),
+    'select_slider': ('options',), # Has no index param but has options param
+    'multiselect': ('options',),
+    'checkbox': ('value',),
+    'datetime_input': (), # A custom input widget. Doesn't use literals
+}
+
+
+# The first characters of a string that could be a number or a datetime, or the whole of a hex color
+VALUEKIND = re.compile(r'(?P<number>\s*[-+]?(?:\d|\.\d|inf|nan))|(?P<hex>#(?:[0-9a-fA-F]{3}){1,2}$)', re.IGNORECASE)
+
+
+# The kinds of values exported without quotes
+BAREKINDS = ('bool', 'int', 'decimal', 'datetime', 'list')
+
+
+# The dtype tags of the native types of the rows' values, by type name. A value of a tag in BAREKINDS is exported bare without being parsed.
+DTYPES = {'bool': 'bool', 'int': 'int', 'float': 'decimal', 'Decimal': 'decimal', 'datetime': 'datetime', 'date': 'datetime', 'time': 'time'}
+
+
+# The converters of the #FORCE type param
+PARAMTYPES = {'int': int, 'float': float, 'str': str, 'bool': lambda value: value if isinstance(value, bool) else str(value) in ('True', 'true')}
+
+
+# The #FORCE params YAML2ST reads as text rather than as Python literals
+RAWPARAMS = ('w', 'hide', 'type', 'key', 'label')
+
+
+# A bounded, thread safe least recently used cache. Streamlit runs each session in its own thread. 
+class LRUCache:
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.__items = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.__lock:
+            if key not in self.__items:
+                return default
+            self.__items.move_to_end(key)
+            return self.__items[key]
+
+    def put(self, key, value):
+        with self.__lock:
+            self.__items[key] = value
+            self.__items.move_to_end(key)
+            while len(self.__items) > self.maxsize:
+                self.__items.popitem(last=False)
+
+    def clear(self):
+        with self.__lock:
+            self.__items.clear()
+
+    def __len__(self):
+        return len(self.__items)
+
+    def __contains__(self, key):
+        return key in self.__items
 
 
-PERSISTDECIMAL = True # e.g. if YAML value 0.01 and user wants the value to be 0.001. Keep True for now. 
+planCache = LRUCache(PLANCACHESIZE)
+widgetSignatures = LRUCache(256) # The keyword arguments each (stObject type, widget) takes
+sourceCache = LRUCache(PLANCACHESIZE) # The parsed original of each exported file, by the hash of its contents
+commentCache = LRUCache(PLANCACHESIZE) # The comments of each exported file, by the hash of its contents
+linkCache = LRUCache(LINKCACHESIZE) # The SharedDocument of each share link, by the hash of the link
+linkLocks = {} # The lock of each share link being decoded, so sessions opening it at once decode it once
+linkLocksLock = threading.Lock()
+exportCache = LRUCache(EXPORTCACHESIZE) # The Future of each export, by the hash of its file, rows, and options
+exportPool = None # The thread pool of exportFuture(), started on first use
+exportPoolLock = threading.Lock()
+specCache = LRUCache(PLANCACHESIZE) # The compiled WidgetSpec of each spec file, by the hash of its contents
+storeLayouts = LRUCache(PLANCACHESIZE) # The rows and default values of each file's ValueStore, by the hash of its contents. Shared by all sessions.
+batchComments = None # The comments of the template of a batch export, set once in each process of its pool
+batchPaths = None # The PathIndex of the template of a batch export, set with batchComments
+pathIndexLock = threading.Lock() # Held to add the breadcrumb of a row that isn't in its file to the file's cached PathIndex
+logger = logging.getLogger("YAML2ST") # Logs each widget call at DEBUG
 
 
-class YAML2ST:
+# The instrumentation hooks. Each is called as hook(event, name, value) for:
+## 'start', stage, None: when a stage starts
+## 'stage', stage, seconds: when a stage ends, with its time
+## 'count', name, n: for a count, e.g. of each widget drawn by its type e.g. 'number_input'
+## The stages are 'parse', 'force' (the #FORCE scan), 'classify' (the compile of the plan), 'render', and 'export'.
+## instrumentHooks are process-wide, e.g. to export metrics, and see the stages of every session. contextHooks are those of the 
+##     instrument() blocks of the current context, so a session's hooks only see its own stages: Streamlit runs each session in its
+##     own thread, and a thread starts with an empty context. With no hooks, a stage or a count costs only the check of both.
+instrumentHooks = []
+contextHooks = contextvars.ContextVar('Y2S hooks', default=())
 
 
-    # Integer check
-    ## Should be called prior to __representsDecimal
-    def __representsInt(s):
-        try:
-            float(s)
-        except ValueError:
-            return False
+# The hooks of the current context: the process-wide ones, then those of the instrument() blocks it's in
+def activeHooks():
+    scoped = contextHooks.get()
+    return [*instrumentHooks, *scoped] if scoped else instrumentHooks
+
+
+# Adds a process-wide hook to instrumentHooks. Returns the hook.
+def addHook(hook):
+    instrumentHooks.append(hook)
+    return hook
+
+
+def removeHook(hook):
+    instrumentHooks.remove(hook)
+
+
+# A context manager that adds the hooks for its block in the current context only e.g. "with y2s.instrument(y2s.StageTimer()) as timer:".
+## Returns the first hook.
+@contextlib.contextmanager
+def instrument(*hooks):
+    token = contextHooks.set(contextHooks.get() + hooks)
+    try:
+        yield hooks[0] if hooks else None
+    finally:
+        contextHooks.reset(token)
+
+
+# Times a stage for the hooks
+class Stage:
+
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        for hook in activeHooks():
+            hook('start', self.name, None)
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = perf_counter() - self.start
+        for hook in activeHooks():
+            hook('stage', self.name, elapsed)
+        return False
+
+
+NOSTAGE = contextlib.nullcontext()
+
+
+# A context manager that times the stage name for the hooks, or does nothing if there are none
+def stage(name):
+    return Stage(name) if instrumentHooks or contextHooks.get() else NOSTAGE
+
+
+# Counts n of name for the hooks
+def count(name, n=1):
+    for hook in activeHooks():
+        hook('count', name, n)
+
+
+# A hook that sums the time of each stage and the counts, e.g. for a Prometheus-style counter or a test
+## times: {stage: seconds}, calls: {stage: times run}, counts: {name: n}
+class StageTimer:
+
+    def __init__(self):
+        self.times = {}
+        self.calls = {}
+        self.counts = {}
+
+    def __call__(self, event, name, value):
+        if event == 'stage':
+            self.times[name] = self.times.get(name, 0.0) + value
+            self.calls[name] = self.calls.get(name, 0) + 1
+        elif event == 'count':
+            self.counts[name] = self.counts.get(name, 0) + value
+
+
+# A hook that logs the time of each stage and the counts to a logger
+class LogHook:
+
+    def __init__(self, log=None, level=logging.INFO):
+        self.log = log if log is not None else logger
+        self.level = level
+
+    def __call__(self, event, name, value):
+        if event == 'stage':
+            self.log.log(self.level, "Y2S stage %s: %.3f ms", name, value * 1000)
+        elif event == 'count':
+            self.log.log(self.level, "Y2S count %s: %d", name, value)
+
+
+# A hook that profiles the stages with cProfile. Read the results with pstats.Stats(hook.profile)
+## stages: the names of the stages to profile. Defaults to all of them
+class ProfileHook:
+
+    def __init__(self, stages=None, profile=None):
+        import cProfile
+        self.stages = stages
+        self.profile = profile if profile is not None else cProfile.Profile()
+
+    def __call__(self, event, name, value):
+        if self.stages is not None and name not in self.stages:
+            return
+        if event == 'start':
+            self.profile.enable()
+        elif event == 'stage':
+            self.profile.disable()
+
+
+# An index of the paths of a file's keys. Each path is interned once as a node with an int id in a parent/child table,
+# so a node's breadcrumb is built once from its parent's, a breadcrumb is looked up to its path without splitting it,
+# and the common prefix of two paths is found by walking up their parents, in O(depth). A key with " > " in it keeps its path.
+# Two paths with the same breadcrumb, e.g. of the keys "a > b" and a: b, can't be told apart by their rows, so they're refused.
+## Node 0 is the top of the file. parents, keys, depths, paths, breadcrumbs: the columns of the nodes by id
+## children: {(parent, key): id}. nodes: {breadcrumb: id}, with -1 for a breadcrumb of more than one path, listed in ambiguous
+## Built with a file's plan and cached with its sourceIndex(). See YAML2ST.pathIndex()
+class PathIndex:
+
+    __slots__ = ('parents', 'keys', 'depths', 'paths', 'breadcrumbs', 'children', 'nodes', 'ambiguous')
+
+    def __init__(self):
+        self.parents = [-1]
+        self.keys = [""]
+        self.depths = [0]
+        self.paths = [()]
+        self.breadcrumbs = [""]
+        self.children = {}
+        self.nodes = {}
+        self.ambiguous = []
+
+    def __len__(self):
+        return len(self.parents) - 1
+
+    # The id of the node of key under the node parent, added if it's new. key: a str
+    def child(self, parent, key):
+        node = self.children.get((parent, key))
+        if node is None:
+            key = sys.intern(key)
+            breadcrumb = sys.intern(key if parent == 0 else self.breadcrumbs[parent] + " > " + key)
+            node = len(self.parents)
+            self.parents.append(parent)
+            self.keys.append(key)
+            self.depths.append(self.depths[parent] + 1)
+            self.paths.append(self.paths[parent] + (key,))
+            self.breadcrumbs.append(breadcrumb)
+            self.children[(parent, key)] = node
+            other = self.nodes.setdefault(breadcrumb, node)
+            if other != node:
+                if other != -1:
+                    self.ambiguous.append(breadcrumb)
+                self.nodes[breadcrumb] = -1
+        return node
+
+    # The id of the node of a tuple of keys, added with its parents if it's new
+    def add(self, path):
+        node = 0
+        for key in path:
+            node = self.child(node, key)
+        return node
+
+    # The id of the node of a breadcrumb. One that isn't indexed, e.g. of a row added to the file, is split on " > " and added.
+    ## Raises ValueError if the breadcrumb is of more than one path
+    def node(self, breadcrumb):
+        node = self.nodes.get(breadcrumb)
+        if node is None:
+            with pathIndexLock:
+                node = self.add(tuple(str(breadcrumb).split(" > ")))
+        elif node < 0:
+            raise ValueError(PathIndex.ambiguityError([breadcrumb]))
+        return node
+
+    # The message of the breadcrumbs of more than one path
+    def ambiguityError(breadcrumbs):
+        return ("YAML2ST: More than one key has the breadcrumb " + ", ".join(repr(breadcrumb) for breadcrumb in breadcrumbs) + 
+                ", e.g. a key with ' > ' in it. Rename one of them.")
+
+    # The tuple of keys of a breadcrumb, e.g. of the breadcrumb column of build()'s DataFrame
+    def path(self, breadcrumb):
+        return self.paths[self.node(breadcrumb)]
+
+    # The depth of the longest common prefix of the paths of the nodes a and b
+    def common(self, a, b):
+        parents, depths = self.parents, self.depths
+        while depths[a] > depths[b]:
+            a = parents[a]
+        while depths[b] > depths[a]:
+            b = parents[b]
+        while a != b:
+            a, b = parents[a], parents[b]
+        return depths[a]
+
+
+# An append-only, columnar store of the rows of a build. Appending to a pandas DataFrame reallocates it each time,
+# so the rows are kept in lists and become the key/st_value/breadcrumb DataFrame only once.
+class BuildRows:
+
+    __slots__ = ('keys', 'values', 'breadcrumbs')
+
+    def __init__(self):
+        self.keys = []
+        self.values = []
+        self.breadcrumbs = []
+
+    def append(self, key, value, breadcrumb):
+        self.keys.append(key)
+        self.values.append(value)
+        self.breadcrumbs.append(breadcrumb)
+
+    def __len__(self):
+        return len(self.keys)
+
+    # The rows as (key, st_value, breadcrumb) tuples, without pandas
+    def records(self):
+        return list(zip(self.keys, self.values, self.breadcrumbs))
+
+    # The rows as the key/st_value/breadcrumb DataFrame. Its index starts at start.
+    ## typed: if True, the keys are categorical and a categorical 'dtype' column tags each value's native type. See YAML2ST.dtype()
+    def toDataFrame(self, start=1, typed=False):
+        import pandas as pd
+        df = pd.DataFrame({'key': self.keys, 'st_value': self.values, 'breadcrumb': self.breadcrumbs}, 
+                          index=range(start, start + len(self.keys)), columns=['key','st_value','breadcrumb'], dtype=object)
+        if typed:
+            df['key'] = df['key'].astype('category')
+            df['dtype'] = pd.Categorical(list(map(YAML2ST.dtype, self.values)))
+        return df
+
+
+# The current value of each breadcrumb of a build, kept in session state and updated by the widgets' on_change callbacks.
+# Only the values the user changed are held per session. The rows and their default values come from the file's layout, 
+# which is built once per file and shared by all sessions. Built by build(store=True).
+## store[breadcrumb] reads the current value of a breadcrumb. toDataFrame() and records() materialize the rows when asked.
+class ValueStore:
+
+    __slots__ = ('digest', 'layout', 'changed', 'failed')
+
+    # digest: the hash of the file's contents. plan: its compiled build plan, for its layout if it isn't cached.
+    def __init__(self, digest, plan):
+        self.digest = digest
+        self.layout = storeLayouts.get(digest)
+        if self.layout is None:
+            self.layout = ValueStore.buildLayout(plan)
+            storeLayouts.put(digest, self.layout)
+        self.changed = {}
+        self.failed = set() # The breadcrumbs of the widgets that streamlit couldn't draw, which have no row as in build()
+
+    # The (keys, breadcrumbs, defaults) of the rows of a build plan, as build() would return them untouched
+    def buildLayout(plan):
+        keys, breadcrumbs, defaults = [], [], {}
+        for step in plan:
+            if step.kind == 'hide' or (step.kind == 'widget' and not step.error):
+                keys.append(step.key)
+                breadcrumbs.append(step.breadcrumb)
+                defaults[step.breadcrumb] = YAML2ST.stepDefault(step)
+        return tuple(keys), tuple(breadcrumbs), MappingProxyType(defaults)
+
+    def __getitem__(self, breadcrumb):
+        changed = self.changed
+        return changed[breadcrumb] if breadcrumb in changed else self.layout[2][breadcrumb]
+
+    def __contains__(self, breadcrumb):
+        return breadcrumb in self.layout[2]
+
+    def __len__(self):
+        return len(self.layout[0])
+
+    def get(self, breadcrumb, default=None):
+        return self[breadcrumb] if breadcrumb in self.layout[2] else default
+
+    # Sets the value of a breadcrumb. Setting it back to its default drops it from the changes.
+    def set(self, breadcrumb, value):
+        if breadcrumb not in self.layout[2]:
+            raise KeyError(breadcrumb)
+        if self.layout[2][breadcrumb] == value:
+            self.changed.pop(breadcrumb, None)
+        else:
+            self.changed[breadcrumb] = value
+
+    # The on_change callback of a widget step, called by streamlit with the step. Reads the widget's value from state.
+    def widgetChanged(self, state, step):
+        if step.widget == 'datetime_input':
+            value = datetime.combine(state[step.breadcrumb + ' > date'], state[step.breadcrumb + ' > time'])
         else:
-            return float(s).is_integer() and ('.' not in str(s))
+            value = state[step.kwargs.get('key', step.breadcrumb)]
+            if step.decFormat: # Will enforce the decimal format as build() does
+                value = YAML2ST.decimalValue(value, step.decFormat)
+        self.set(step.breadcrumb, value)
+
+    # The {breadcrumb: value} of the values the user changed
+    def changes(self):
+        return dict(self.changed)
+
+    def rows(self):
+        keys, breadcrumbs, defaults = self.layout
+        changed, failed = self.changed, self.failed
+        return ((key, changed[breadcrumb] if breadcrumb in changed else defaults[breadcrumb], breadcrumb) 
+                for key, breadcrumb in zip(keys, breadcrumbs) if not failed or breadcrumb not in failed)
+
+    # The rows as (key, st_value, breadcrumb) tuples, without pandas
+    def records(self):
+        return list(self.rows())
+
+    # The rows as the key/st_value/breadcrumb DataFrame that build() returns. Its index starts at start. See BuildRows.toDataFrame()
+    def toDataFrame(self, start=1, typed=False):
+        rows = BuildRows()
+        for key, value, breadcrumb in self.rows():
+            rows.append(key, value, breadcrumb)
+        return rows.toDataFrame(start, typed)
+
+
+# The comments of a file by their line number, from 0, to re-insert them on export. Built by YAML2ST.prepComments().
+## lines, texts: the sorted numbers of the comment lines, '---' lines, and blank lines, and their text ("" for a blank line)
+## trailing, trailingTexts: the sorted numbers of the lines with a comment after their data, and the comment
+class CommentIndex:
+
+    __slots__ = ('lines', 'texts', 'trailing', 'trailingTexts')
+
+    def __init__(self):
+        self.lines = array('q')
+        self.texts = []
+        self.trailing = array('q')
+        self.trailingTexts = []
+
+    def __len__(self):
+        return len(self.lines) + len(self.trailing)
+
+    # A cursor of merge() that starts at line
+    def cursor(self, line=0):
+        return [bisect_left(self.lines, line), bisect_left(self.trailing, line - 1)]
+
+    # Passes the trailing comment of the line before line, then each comment line from line on, to write. Returns the next line.
+    ## The cursor moves forward through both tables, so a file's lines must be merged in order.
+    def merge(self, line, write, cursor):
+        lines, trailing = self.lines, self.trailing
+        i, j = cursor
+        while True:
+            while j < len(trailing) and trailing[j] < line - 1:
+                j += 1
+            if j < len(trailing) and trailing[j] == line - 1:
+                write(' ' + self.trailingTexts[j])
+                j += 1
+            while i < len(lines) and lines[i] < line:
+                i += 1
+            if i == len(lines) or lines[i] != line:
+                break
+            write(('' if line == 0 else '\n') + self.texts[i])
+            i += 1
+            line += 1
+        cursor[0], cursor[1] = i, j
+        return line
+
+
+# A file's build plan and widget values loaded from a binary snapshot, without parsing its YAML. Built by loadSnapshot().
+## Acts as the file's upload: build() draws its plan with its values, and export() and the share links use its source file.
+## source: the bytes of the file the snapshot was made of, with its comments and #FORCE params
+## plan: its compiled build plan. rows: the BuildRows of its widget values
+## changed: the (step, row) indexes of the values that differ from their step's default
+class Snapshot:
+
+    __slots__ = ('name', 'source', 'plan', 'rows', 'changed', 'paths')
+
+    # paths: the PathIndex of its plan
+    def __init__(self, name, source, plan, rows, changed, paths=None):
+        self.name = name
+        self.source = source
+        self.plan = plan
+        self.rows = rows
+        self.changed = changed
+        self.paths = paths
+
+    def getvalue(self):
+        return self.source
+
+    # The file as YAML with its comments and #FORCE params, and the snapshot's values
+    def toYAML(self):
+        newFile = io.StringIO()
+        YAML2ST.writeExport(self.rows, newFile, YAML2ST.commentIndex(self.source), self.paths)
+        return newFile.getvalue().encode("utf-8")
+
+
+# A sidecar widget spec: the #FORCE params of the keys whose breadcrumbs match glob patterns, to configure families of keys in one place.
+# Compiled once into a matcher that walks a file's PathIndex, so each key costs a step from its parent's match state, not a parse.
+## rules: {pattern: params}, applied in order, so a later rule's params win. A key's own #FORCE params win over the spec's.
+##     pattern: a breadcrumb whose keys may be globs e.g. "servers > * > port". A "**" key matches any number of keys.
+##     params: a #FORCE directive e.g. "w=slider|max_value=100", or a dict e.g. {w: slider, max_value: 100} of YAML values
+## Raises ValueError with the errors of all the rules at once. See loadSpec()
+class WidgetSpec:
+
+    __slots__ = ('rules', 'digest', 'start', 'matched')
+
+    def __init__(self, rules):
+        self.rules = []
+        errors = []
+        for pattern, params in rules.items():
+            try:
+                self.rules.append((WidgetSpec.compilePattern(pattern), WidgetSpec.compileParams(params)))
+            except ValueError as e:
+                errors.append(str(pattern) + ": " + str(e))
+        if errors:
+            raise ValueError("YAML2ST: Bad widget spec:\n\n" + "\n\n".join(errors))
+        self.digest = hashlib.sha256(json.dumps([[str(pattern), params] for pattern, params in rules.items()], 
+                                                default=str, sort_keys=True).encode('utf-8')).hexdigest()
+        self.start = self.__close({(rule, 0) for rule in range(len(self.rules))})
+        self.matched = {(): None} # The merged params of each match state
+
+    # The keys of a pattern: None for "**", the key for a literal, or the match of a glob
+    def compilePattern(pattern):
+        import fnmatch
+        keys = str(pattern).split(" > ")
+        if any(key == "" for key in keys):
+            raise ValueError("A pattern's keys can't be blank.")
+        return tuple(None if key == "**" else re.compile(fnmatch.translate(key)).match if any(char in key for char in "*?[") else key 
+                     for key in keys)
+
+    # The params of a rule as the literals of a #FORCE directive
+    def compileParams(params):
+        if isinstance(params, str):
+            return MappingProxyType(YAML2ST.parseForce(params))
+        if not isinstance(params, dict):
+            raise ValueError("The params must be a #FORCE directive or a dict.")
+        literalParam = {str(name): str(value) if name in RAWPARAMS else repr(value) for name, value in params.items()}
+        errors = YAML2ST.forceErrors(literalParam)
+        if errors:
+            raise ValueError(" ".join(errors))
+        return MappingProxyType(literalParam)
+
+    # Helper
+    # Adds the states past each "**" that matches no keys
+    def __close(self, states):
+        pending = list(states)
+        while pending:
+            rule, index = pending.pop()
+            keys = self.rules[rule][0]
+            if index < len(keys) and keys[index] is None and (rule, index + 1) not in states:
+                states.add((rule, index + 1))
+                pending.append((rule, index + 1))
+        return tuple(sorted(states))
+
+    # The match state of a key from its parent's
+    def step(self, state, key):
+        states = set()
+        for rule, index in state:
+            keys = self.rules[rule][0]
+            if index < len(keys):
+                match = keys[index]
+                if match is None:
+                    states.add((rule, index))
+                elif match == key if isinstance(match, str) else match(key):
+                    states.add((rule, index + 1))
+        return self.__close(states) if states else ()
+
+    # The merged params of the rules a state matches, or None
+    def params(self, state):
+        if state in self.matched:
+            return self.matched[state]
+        merged = {}
+        for rule, index in state:
+            keys, literalParam = self.rules[rule]
+            if index == len(keys):
+                merged[rule] = literalParam
+        params = MappingProxyType({name: literal for rule in sorted(merged) for name, literal in merged[rule].items()}) if merged else None
+        self.matched[state] = params
+        return params
+
+    # The #FORCE params of each path of a PathIndex, the spec's with the file's forces over them. Returns {path: params}
+    def forces(self, paths, forces=None):
+        merged = dict(forces) if forces else {}
+        parents, keys = paths.parents, paths.keys
+        states = [self.start]
+        for node in range(1, len(parents)):
+            parent = states[parents[node]]
+            state = self.step(parent, keys[node]) if parent else ()
+            states.append(state)
+            params = self.params(state) if state else None
+            if params is not None:
+                path = paths.paths[node]
+                own = merged.get(path)
+                merged[path] = params if own is None else {**params, **own}
+        return merged
+
+
+# A renderer backend that draws nothing and needs no Streamlit, for batch jobs and API workers. Pass it to build() as the stObject.
+## Widgets take their default values and each is described in the manifest: {breadcrumb: entry}. See YAML2ST.manifestEntry()
+## errors: the messages of a file that couldn't be built
+class HeadlessRenderer:
+
+    __slots__ = ('manifest', 'errors')
+
+    def __init__(self):
+        self.manifest = OrderedDict()
+        self.errors = []
+
+    def markdown(self, *args, **kwargs):
+        pass
+
+    def error(self, body, *args, **kwargs):
+        self.errors.append(str(body))
+
+    # Fills rows with the default value of each step of the plan and describes its widget in the manifest
+    def render(self, plan, rows):
+        return YAML2ST.replayHeadless(plan, rows, self.manifest)
+
+
+class YAML2ST:
 
 
     # List check
@@ -43,47 +701,129 @@ class YAML2ST:
                 return True
             else:
                 return False
-        except ValueError:
+        except (ValueError, SyntaxError):
             return False
 
 
-    # Decimal check 
-    def __representsDecimal(s):
-        try: 
-            float(s)
-            return True
-        except ValueError:
-            return False
+    # Classifies a value to the kind of input widget it is dynamically shown with, in the conditional order of YAML2ST Dynamics
+    ## The native types PyYAML already parsed are used as is. Only strings are inspected, once per distinct string.
+    ## Returns 'bool', 'int', 'decimal', 'datetime', 'hex', 'text_area', 'list', or 'text'
+    def classify(value):
+        if isinstance(value, bool):
+            return 'bool'
+        if isinstance(value, int):
+            return 'int'
+        if isinstance(value, float):
+            return 'decimal'
+        if isinstance(value, (datetime, date)):
+            return 'datetime'
+        return YAML2ST.__classifyText(str(value))
+
+
+    # Helper
+    # Classifies a string with one precompiled regex. Only a candidate number, datetime, or list is converted to confirm it.
+    @functools.lru_cache(maxsize=CLASSIFYCACHESIZE)
+    def __classifyText(s):
+        if s == 'True' or s == 'true' or s == 'False' or s == 'false':
+            return 'bool'
+        match = VALUEKIND.match(s)
+        if match is not None:
+            if match.lastgroup == 'number':
+                try:
+                    number = float(s)
+                    return 'int' if number.is_integer() and '.' not in s else 'decimal'
+                except ValueError:
+                    pass
+                if s[:4].isdigit() and YAML2ST.__parseDatetime(s) is not None:
+                    return 'datetime'
+            elif match.lastgroup == 'hex':
+                return 'hex'
+        if '\n' in s:
+            return 'text_area'
+        if YAML2ST.__representsList(s):
+            return 'list'
+        return 'text'
 
 
-    # Datetime check
-    def __representsDatetime(s):
+    # Helper
+    # Parses an ISO-8601 string, once per distinct string. Returns None if it isn't one.
+    @functools.lru_cache(maxsize=CLASSIFYCACHESIZE)
+    def __parseDatetime(s):
+        from dateutil import parser
         try: 
-            parser.isoparse(str(s))
-            return True
-        except ValueError:
-            return False
+            return parser.isoparse(s)
+        except (ValueError, OverflowError):
+            return None
 
 
-    # Hex check
-    def __representsHex(s):
-        if not s.startswith('#'):
-            return False
-        valid = re.search(r'^#(?:[0-9a-fA-F]{3}){1,2}$', s)
-        if valid is None:
-            return False
-        else:
-            return True
+    # The datetime of a value classified as 'datetime'
+    def toDatetime(value):
+        if isinstance(value, datetime):
+            return value
+        if isinstance(value, date):
+            return datetime.combine(value, time())
+        return YAML2ST.__parseDatetime(str(value))
 
 
     # Calculate the streamlit widget Step by the lowest decimal position
     def __calcPrecision(s):
+        from decimal import Decimal
         d = Decimal(s)
         decFormat = "%.{}f".format(abs(d.as_tuple().exponent))
         decStep = float("1e-{}".format(abs(d.as_tuple().exponent)))
         return decFormat, decStep
 
 
+    # The value of a decimal widget as a Decimal rounded to the places of its format, e.g. Decimal('0.010') for 0.01 and "%.3f"
+    ## Rounds as decFormat % value does, but keeps the number rather than its text. A value that isn't a finite number is kept as is.
+    def decimalValue(value, decFormat):
+        if type(value).__name__ not in ('float', 'int', 'Decimal'):
+            return value
+        Decimal, quantum, context = YAML2ST.__decimalPlaces(decFormat)
+        try:
+            return Decimal(value).quantize(quantum, context=context)
+        except ArithmeticError: # inf or nan
+            return value
+
+
+    # Helper
+    # The Decimal type, and the quantum and context that round to the places of a decimal format
+    @functools.lru_cache(maxsize=64)
+    def __decimalPlaces(decFormat):
+        from decimal import Decimal, Context, ROUND_HALF_EVEN
+        places = int(decFormat[2:-1])
+        return Decimal, Decimal(1).scaleb(-places), Context(prec=400 + places, rounding=ROUND_HALF_EVEN) # Enough digits for any float
+
+
+    # The dtype tag of a row's value by its native type: a value of DTYPES, 'list', 'text', 'none', or 'object'. Text isn't parsed.
+    def dtype(value):
+        tag = DTYPES.get(type(value).__name__)
+        if tag is not None:
+            return tag
+        if isinstance(value, str):
+            return 'text'
+        if isinstance(value, (list, tuple)):
+            return 'list'
+        return 'none' if value is None else 'object'
+
+
+    # The text of a value, e.g. to export it. A Decimal is written without an exponent, as decFormat % value would.
+    def valueText(value):
+        if type(value).__name__ == 'Decimal':
+            return format(value, 'f')
+        return str(value)
+
+
+    # Helper
+    # The text of a value and whether it's exported bare, without quotes. Native values are decided by their dtype; only text is classified.
+    def __exportValue(st_value):
+        if DTYPES.get(type(st_value).__name__) in BAREKINDS:
+            return YAML2ST.valueText(st_value), True
+        text = str(st_value)
+        kind = YAML2ST.classify(text)
+        return text, kind in BAREKINDS or (kind == 'text_area' and YAML2ST.__representsList(text))
+
+
     # Safely gets the last crumbs via index
     def checkCrumbs(lastBreadcrumbs, index):
         try: 
@@ -93,75 +833,541 @@ class YAML2ST:
             return ""
 
 
-    # Recursively checks and returns any line comments
+    # Writes any comments of the line and the comment lines after it to newFile. Returns the next line.
     def lineCheck(line_to_comment, line, newFile):
-        if ('~'+str(line)) in line_to_comment:
-            newFile.write(' ' + line_to_comment.get('~'+str(line)))
-        if str(line) in line_to_comment:
-            newFile.write(('' if line == 0 else '\n') + line_to_comment.get(str(line)))
-            line = YAML2ST.lineCheck(line_to_comment, line + 1, newFile)
-        return line
+        return line_to_comment.merge(line, newFile.write, line_to_comment.cursor(line))
 
 
-    # Preps the comments to be used for export
+    # Helper
+    # The index of the '#' that starts the comment of a line, or -1. A '#' within quotes or a word e.g. "#0EE2D7" isn't a comment.
+    def __commentStart(text):
+        quote = None
+        for index, char in enumerate(text):
+            if quote is not None:
+                if char == quote and not (quote == '"' and text[index-1] == '\\'):
+                    quote = None
+            elif char in '"\'' and (index == 0 or text[index-1] in ' \t:[{,-'):
+                quote = char
+            elif char == '#' and (index == 0 or text[index-1] in ' \t'):
+                return index
+        return -1
+
+
+    # Preps the comments to be used for export. Returns a CommentIndex of the comments by line.
+    ## upload: a binary file-like object to read the lines of e.g. io.BytesIO(data)
     def prepComments(upload):
-        line_to_comment = {}
-        if upload: 
+        comments = CommentIndex()
+        if upload:
             for index, line in enumerate(upload):
+                stripped = line.strip()
+                if not stripped: # For blank lines
+                    comments.lines.append(index)
+                    comments.texts.append("")
+                elif stripped.startswith(b'#') or stripped.startswith(b'---'): # Regular comment or beginning of YAML
+                    comments.lines.append(index)
+                    comments.texts.append(stripped.decode('utf-8'))
+                elif b'#' in stripped: # locates the comment and stores the comment
+                    text = stripped.decode('utf-8')
+                    sindex = YAML2ST.__commentStart(text)
+                    if sindex != -1:
+                        comments.trailing.append(index)
+                        comments.trailingTexts.append(text[sindex:])
+
+        return comments
+
+
+    # The CommentIndex of the bytes of a file, indexed once and cached by the hash of its contents
+    def commentIndex(data):
+        digest = hashlib.sha256(data).hexdigest()
+        comments = commentCache.get(digest)
+        if comments is None:
+            comments = YAML2ST.prepComments(io.BytesIO(data))
+            commentCache.put(digest, comments)
+        return comments
+
+
+    # Scans the data string once and indexes each line's #FORCE directive by its line number
+    ## Comment lines and the beginning of a YAML are skipped. Returns {line: (column, forceVal)}
+    def __lineForces(dataString):
+        lineForce = {}
+        line = 0
+        lastEnd = 0
+        sIndex = dataString.find('#FORCE:')
+        while sIndex != -1:
+            line += dataString.count('\n', lastEnd, sIndex)
+            lineStart = dataString.rfind('\n', 0, sIndex) + 1
+            lineEnd = dataString.find('\n', sIndex)
+            if lineEnd == -1:
+                lineEnd = len(dataString)
+            data_string_line = dataString[lineStart:lineEnd]
+            if not (data_string_line.lstrip(' ').startswith("#") or data_string_line.lstrip(' ').startswith("---")):
+                lineForce[line] = (sIndex - lineStart, dataString[sIndex+7:lineEnd].rstrip('\r'))
+            lastEnd = sIndex
+            sIndex = dataString.find('#FORCE:', lineEnd)
+        return lineForce
+
+
+    # Helper
+    # The mark of the end of a node's text. PyYAML ends a block sequence or dict where the next key starts, so it ends with its last item.
+    def __nodeEnd(node):
+        import yaml
+        while isinstance(node, (yaml.SequenceNode, yaml.MappingNode)) and not node.flow_style and node.value:
+            node = node.value[-1] if isinstance(node, yaml.SequenceNode) else node.value[-1][1]
+        return node.end_mark
+
+
+    # Finds the #FORCE directive of a key by the marks of its key and value nodes
+    ## The directive is a comment so it must follow the key and any value on the same line. 
+    ## A multi-line value, other than a block scalar, may have the directive trailing any of its lines.
+    def __nodeForce(lineForce, keyNode, valueNode):
+        import yaml
+        keyLine = keyNode.start_mark.line
+        minColumn = keyNode.end_mark.column
+        end = YAML2ST.__nodeEnd(valueNode)
+        endLine, endColumn = end.line, end.column
+        if endColumn == 0 and endLine > keyLine: # Ends with a line break, e.g. a block scalar that is the last item of a sequence
+            endLine, endColumn = endLine - 1, -1
+        if endLine == keyLine:
+            minColumn = max(minColumn, endColumn)
+        entry = lineForce.get(keyLine)
+        if entry is not None and entry[0] >= minColumn:
+            return lineForce.pop(keyLine)[1]
+        if isinstance(valueNode, yaml.MappingNode) or (isinstance(valueNode, yaml.ScalarNode) and valueNode.style in ('|', '>')):
+            return ""
+        for line in range(keyLine + 1, endLine + 1):
+            entry = lineForce.get(line)
+            if entry is not None and (line != endLine or entry[0] >= endColumn):
+                return lineForce.pop(line)[1]
+        return ""
+
+
+    # Splits the #FORCE params into key value pairs so we can parse the keys
+    ## Raises ValueError with the directive's errors
+    def parseForce(forceVal):
+        return dict(YAML2ST.__parseForceText(forceVal)) if forceVal != "" else {}
+
+
+    # Helper
+    # Parses a #FORCE directive once per distinct directive, as files repeat them across many keys. Returns the params read only
+    @functools.lru_cache(maxsize=FORCECACHESIZE)
+    def __parseForceText(forceVal):
+        literalParam = {}
+        errors = []
+        for fitem in YAML2ST.__stripSpace(forceVal).split("|"):
+            if fitem != "":
+                fkey, equals, fvalue = fitem.partition("=")
+                if not equals or not fkey:
+                    errors.append("'" + fitem + "' isn't a param=value.")
+                else:
+                    literalParam[fkey] = fvalue
+        errors.extend(YAML2ST.forceErrors(literalParam))
+        if errors:
+            raise ValueError(" ".join(errors))
+        return MappingProxyType(literalParam)
+
+
+    # The errors of a key's #FORCE params that would stop its build, or only show when its widget is drawn. Returns a list
+    def forceErrors(literalParam):
+        errors = []
+        if 'w' in literalParam and not str(literalParam['w']).isidentifier():
+            errors.append("w=" + str(literalParam['w']) + " isn't a widget.")
+        if 'type' in literalParam and str(literalParam['type']).strip('"\'') not in PARAMTYPES:
+            errors.append("type=" + str(literalParam['type']) + " isn't one of " + ", ".join(PARAMTYPES) + ".")
+        if 'options' in literalParam:
+            try:
+                options = ast.literal_eval(literalParam['options'])
+            except (ValueError, SyntaxError):
+                options = None
+            if not isinstance(options, (list, tuple)):
+                errors.append("options=" + str(literalParam['options']) + " isn't a list.")
+        if 'index' in literalParam:
+            try:
+                int(literalParam['index'])
+            except (ValueError, TypeError):
+                errors.append("index=" + str(literalParam['index']) + " isn't an int.")
+        return errors
+
+
+    # Indexes the parsed #FORCE params of each key by a tuple of its breadcrumbs in a single pass over the data string
+    ## Keys are located with their PyYAML node marks so comments, blank lines, and multi-line values don't misalign the directives. 
+    ## dataString: a string of all the data in the YAML file
+    ## node: the composed root node of dataString, if already parsed
+    ## errors: a list to add the errors of bad directives to, each with its breadcrumb, to report them all at once. Raises the first if None.
+    def forceIndex(dataString, node=None, errors=None):
+        import yaml
+        forces = {}
+        lineForce = YAML2ST.__lineForces(dataString)
+        if not lineForce:
+            return forces
+        if node is None:
+            try: 
+                node = yaml.compose(dataString, YAML2ST.safeLoader())
+            except yaml.YAMLError: # Maybe it's JSON
+                return forces
+
+        stack = [((), node)] if isinstance(node, yaml.MappingNode) else []
+        while stack:
+            breadcrumbs, mappingNode = stack.pop()
+            for keyNode, valueNode in mappingNode.value:
+                crumbs = breadcrumbs + (str(keyNode.value),)
+                forceVal = YAML2ST.__nodeForce(lineForce, keyNode, valueNode)
+                if forceVal != "":
+                    try:
+                        forces[crumbs] = YAML2ST.__parseForceText(forceVal)
+                    except ValueError as e:
+                        if errors is None:
+                            raise
+                        errors.append(" > ".join(crumbs) + ": " + str(e))
+                if isinstance(valueNode, yaml.MappingNode):
+                    stack.append((crumbs, valueNode))
+        return forces
+
+
+    # Indexes the character span of each key's value in the data string by its breadcrumb. Returns {breadcrumb: (start, end)}
+    ## Values are located with their PyYAML node marks. Aliases are left out as their node is the anchor's value, and so are
+    ##     sequences as indented as their key. A block sequence ends with its last item.
+    ## dataString: a string of all the data in the YAML file
+    ## node: the composed root node of dataString, if already parsed
+    def valueSpans(dataString, node=None):
+        import yaml
+        spans = {}
+        if node is None:
+            node = yaml.compose(dataString, YAML2ST.safeLoader())
+
+        stack = [((), node)] if isinstance(node, yaml.MappingNode) else []
+        while stack:
+            breadcrumbs, mappingNode = stack.pop()
+            for keyNode, valueNode in mappingNode.value:
+                crumbs = breadcrumbs + (str(keyNode.value),)
+                if isinstance(valueNode, yaml.MappingNode):
+                    stack.append((crumbs, valueNode))
+                elif isinstance(valueNode, yaml.SequenceNode) and not valueNode.flow_style and valueNode.start_mark.column <= keyNode.start_mark.column:
+                    continue # A sequence as indented as its key. A value in its place would have to move up to the key's line.
+                elif valueNode.start_mark.index >= keyNode.end_mark.index:
+                    spans[" > ".join(crumbs)] = (valueNode.start_mark.index, YAML2ST.__nodeEnd(valueNode).index)
+        return spans
+
+
+    # Helper
+    # Wraps a binary stream for the YAML parser so it reads whole lines and indexes the #FORCE directives of the lines as they pass.
+    ## So streaming a file needs no second copy of its text to find the directives. Fills lineForce: {line: (column, forceVal)}
+    def __forceReader(stream, lineForce):
+        lines = [0]
+        def read(size=-1):
+            data = stream.read(size)
+            if data and not data.endswith(b'\n'):
+                data += stream.readline()
+            if b'#FORCE:' in data:
+                for line, force in YAML2ST.__lineForces(data.decode('utf-8')).items():
+                    lineForce[lines[0] + line] = force
+            lines[0] += data.count(b'\n')
+            return data
+        return SimpleNamespace(read=read)
+
+
+    # Helper
+    # Composes the next node of the YAML parser's events, e.g. a value or a key, with the nodes of its items
+    def __composeEvent(loader, anchors):
+        import yaml
+        event = loader.get_event()
+        if isinstance(event, yaml.AliasEvent):
+            if event.anchor not in anchors:
+                raise yaml.composer.ComposerError(None, None, "found undefined alias " + repr(event.anchor), event.start_mark)
+            return anchors[event.anchor]
+        if isinstance(event, yaml.ScalarEvent):
+            tag = event.tag if event.tag not in (None, '!') else loader.resolve(yaml.ScalarNode, event.value, event.implicit)
+            node = yaml.ScalarNode(tag, event.value, event.start_mark, event.end_mark, style=event.style)
+        else:
+            nodeClass, endClass = (yaml.SequenceNode, yaml.SequenceEndEvent) if isinstance(event, yaml.SequenceStartEvent) else (yaml.MappingNode, yaml.MappingEndEvent)
+            tag = event.tag if event.tag not in (None, '!') else loader.resolve(nodeClass, None, event.implicit)
+            node = nodeClass(tag, [], event.start_mark, None, flow_style=event.flow_style)
+            while not loader.check_event(endClass):
+                if nodeClass is yaml.SequenceNode:
+                    node.value.append(YAML2ST.__composeEvent(loader, anchors))
+                else:
+                    node.value.append((YAML2ST.__composeEvent(loader, anchors), YAML2ST.__composeEvent(loader, anchors)))
+            node.end_mark = loader.get_event().end_mark
+        if event.anchor is not None:
+            anchors[event.anchor] = node
+        return node
+
+
+    # Streams the keys of a YAML or JSON file one at a time as IngestRecords, in the order of the file, for files too big to load whole. 
+    ## Uses the parser's events, and libyaml when PyYAML has it, so only the record being read and the anchors are held in memory. 
+    ## Each dict is a record with an empty dict value, followed by the records of its keys. A repeated key is a record each time. 
+    ## stream: a binary file-like object e.g. an open file or UploadedFile, or the bytes of a file
+    ## Raises yaml.YAMLError if the file isn't valid YAML, after the records before the error have been yielded
+    def iterRecords(stream):
+        import yaml
+        if isinstance(stream, bytes):
+            stream = io.BytesIO(stream)
+        lineForce = {}
+        loader = YAML2ST.safeLoader()(YAML2ST.__forceReader(stream, lineForce))
+        anchors = {}
+        try:
+            loader.get_event() # The start of the stream
+            if loader.check_event(yaml.StreamEndEvent):
+                return
+            loader.get_event() # The start of the document
+            if not loader.check_event(yaml.MappingStartEvent):
+                raise yaml.YAMLError("YAML2ST: The top of the file must be a dict of keys.")
+            loader.get_event()
+
+            # Each entry is the path of a dict being streamed, or the path and the items of a dict already composed e.g. an alias
+            stack = [((), None)]
+            while stack:
+                path, items = stack[-1]
+                streamed = False
+                if items is None:
+                    if loader.check_event(yaml.MappingEndEvent):
+                        loader.get_event()
+                        stack.pop()
+                        continue
+                    keyNode = YAML2ST.__composeEvent(loader, anchors)
+                    event = loader.peek_event()
+                    if isinstance(event, yaml.MappingStartEvent) and event.anchor is None:
+                        loader.get_event()
+                        valueNode = yaml.MappingNode(None, [], event.start_mark, event.start_mark) # Streamed, so only its start is known
+                        streamed = True
+                    else:
+                        valueNode = YAML2ST.__composeEvent(loader, anchors)
+                else:
+                    pair = next(items, None)
+                    if pair is None:
+                        stack.pop()
+                        continue
+                    keyNode, valueNode = pair
+
+                if keyNode.tag == 'tag:yaml.org,2002:merge': # Checked before it's constructed, which a merge key can't be on its own
+                    raise yaml.YAMLError("YAML2ST: Merge keys (<<) can't be streamed. Use build() without stream.")
+                key = loader.construct_object(keyNode)
+                keyPath = path + (str(key),)
+                forceVal = YAML2ST.__nodeForce(lineForce, keyNode, valueNode) if lineForce else ""
+                force = YAML2ST.__parseForceText(forceVal) if forceVal != "" else {}
+                if isinstance(valueNode, yaml.MappingNode):
+                    yield IngestRecord(" > ".join(keyPath), {}, keyNode.start_mark.line, force, key, keyPath)
+                    stack.append((keyPath, None if streamed else iter(valueNode.value)))
+                else:
+                    value = loader.construct_object(valueNode, deep=True)
+                    yield IngestRecord(" > ".join(keyPath), value, keyNode.start_mark.line, force, key, keyPath)
+                loader.constructed_objects = {} # Holds only the record being read
+        finally:
+            loader.dispose()
 
-                line2 = str(line.decode('utf-8'))
-                if not line2.lstrip(' ').startswith("\n"): # it is an intended white space
-                    line2 = line2.strip() # strip() removes the /n
-
-                    # Store the lines
-                    if line2.lstrip(' ').startswith("#") or line2.lstrip(' ').startswith("---"): # Regular comment or beginning of YAML
-                        line_to_comment[str(index)] = line2
-                    elif line2.find('#') != -1: # locates the comment and stores the comment
-                        sindex = line2.find('#')
-                        if not YAML2ST.__representsHex(line2[sindex:0]):
-                            line_to_comment['~' + str(index+1)] = line2[sindex:len(line2)]
-                else: # For blank lines
-                    line_to_comment[str(index)] = ""
-
-        return line_to_comment
-
-
-    # Recursively parses each YAML line ('/n') separating any YAML comments 
-    def __forceConfig(dataString):
-        forceVal = "" 
-        lIndex = dataString.find("\n")
-        if lIndex == -1:
-            lIndex = len(dataString)
-        data_string_line = dataString[:lIndex]
-        dataString = dataString[lIndex+1:]
-        if data_string_line.lstrip(' ').startswith("#") or data_string_line.lstrip(' ').startswith("---"):
-            return YAML2ST.__forceConfig(dataString)
-        elif data_string_line.find('#FORCE:') != -1:
-            sIndex = data_string_line.find('#FORCE:')
-            forceVal = data_string_line[int(sIndex+7):]
-        return dataString, forceVal
-
-
-    # Builds a file from the data 
-    def recursiveExport(df, lastBreadcrumbs, newFile, line_to_comment, line):
-        if not df.empty:
-            row = df.iloc[0]
-            breadcrumbs = str(row['breadcrumb']).split(" > ")[:-1]
-            for index, crumb in enumerate(breadcrumbs):
-                if YAML2ST.checkCrumbs(lastBreadcrumbs, index) != crumb:
-                    newFile.write(('' if line == 0 else '\n') + ('  ' * index) + crumb + ':')
-                    line = YAML2ST.lineCheck(line_to_comment, line + 1, newFile)
+
+    # Helper
+    # The rows of the data as (key, st_value, breadcrumb). Accepts a DataFrame, BuildRows, or the records of build()
+    def __exportRows(df):
+        if isinstance(df, BuildRows):
+            return zip(df.keys, df.values, df.breadcrumbs)
+        if isinstance(df, ValueStore):
+            return df.rows()
+        if isinstance(df, list):
+            return iter(df)
+        return zip(df['key'].tolist(), df['st_value'].tolist(), df['breadcrumb'].tolist())
+
+
+    # Helper
+    # Yields the text of each row of the data in a single pass, re-inserting the comments after each line
+    ## last: the PathIndex node of the parent of the row written before. paths: the PathIndex of the rows' breadcrumbs
+    def __exportChunks(df, last, line_to_comment, line, paths):
+        cursor = line_to_comment.cursor(line)
+        chunks = []
+        write = chunks.append
+        parents, depths = paths.parents, paths.depths
+        for key, st_value, breadcrumb in YAML2ST.__exportRows(df):
+            parent = parents[paths.node(breadcrumb)]
+            depth = depths[parent]
+
+            # The parents after the common prefix with the row before are new
+            common = paths.common(last, parent)
+            if common < depth:
+                for index, crumb in enumerate(paths.paths[parent][common:], common):
+                    write(('' if line == 0 else '\n') + ('  ' * index) + crumb + ':')
+                    line = line_to_comment.merge(line + 1, write, cursor)
             
-            st_value = str(row['st_value'])
-            if (YAML2ST.__representsInt(st_value) or YAML2ST.__representsList(st_value) or YAML2ST.__representsDecimal(st_value) or 
-                YAML2ST.__representsDatetime(st_value) or st_value == 'True' or st_value == 'False' or st_value == 'true' or st_value == 'false'):
-                newFile.write(('' if line == 0 else '\n') + ('  ' * len(breadcrumbs)) + str(row['key']) + ': ' + st_value)
-                line = YAML2ST.lineCheck(line_to_comment, line + 1, newFile)
+            st_value, bare = YAML2ST.__exportValue(st_value)
+            if bare:
+                write(('' if line == 0 else '\n') + ('  ' * depth) + str(key) + ': ' + st_value)
             else:
-                newFile.write(('' if line == 0 else '\n') + ('  ' * len(breadcrumbs)) + str(row['key']) + ': \"' + st_value + '\"')
-                line = YAML2ST.lineCheck(line_to_comment, line + 1, newFile)
+                write(('' if line == 0 else '\n') + ('  ' * depth) + str(key) + ': \"' + st_value + '\"')
+            line = line_to_comment.merge(line + 1, write, cursor)
+
+            last = parent
+            yield "".join(chunks)
+            chunks.clear()
+
+
+    # A generator of the text of a file built from the data, with the comments of line_to_comment re-inserted
+    ## Walks the rows once without recursion, so its time grows linearly with the number of keys. 
+    ## df: the changed values of the uploaded file. A DataFrame, BuildRows, or the records of build()
+    ## line_to_comment: the comments from prepComments()
+    ## paths: the PathIndex of the file, from pathIndex(). Without it, the breadcrumbs are split on " > "
+    def iterExport(df, line_to_comment, paths=None):
+        chunks = []
+        line = line_to_comment.merge(0, chunks.append, line_to_comment.cursor())
+        if chunks:
+            yield "".join(chunks)
+        yield from YAML2ST.__exportChunks(df, 0, line_to_comment, line, PathIndex() if paths is None else paths)
+
+
+    # Writes a file built from the data to any text stream e.g. an open file or io.StringIO
+    def writeExport(df, newFile, line_to_comment, paths=None):
+        newFile.writelines(YAML2ST.iterExport(df, line_to_comment, paths))
+
+
+    # Builds a file from the data, from the line after the comments already written to newFile
+    ## Kept for its signature. Walks the rows in a loop rather than recursing on each row. 
+    def recursiveExport(df, lastBreadcrumbs, newFile, line_to_comment, line, paths=None):
+        paths = PathIndex() if paths is None else paths
+        with pathIndexLock:
+            last = paths.add(tuple(str(crumb) for crumb in lastBreadcrumbs))
+        newFile.writelines(YAML2ST.__exportChunks(df, last, line_to_comment, line, paths))
+
+
+    # The flattened data of a file, the spans of its values, and the index of its paths, parsed once and cached by the hash of its contents
+    ## Returns (flattenData(), valueSpans(), PathIndex). The spans are None if the file isn't YAML e.g. JSON that YAML can't parse.
+    def sourceIndex(data):
+        import yaml
+        digest = hashlib.sha256(data).hexdigest()
+        index = sourceCache.get(digest)
+        if index is None:
+            dataString = data.decode("utf-8")
+            paths = PathIndex()
+            try:
+                dataDict, node = YAML2ST.composeDocument(dataString)
+                index = (YAML2ST.flattenData(dataDict, paths), YAML2ST.valueSpans(dataString, node), paths)
+            except yaml.YAMLError:
+                index = (YAML2ST.flattenData(json.loads(dataString), paths), None, paths)
+            sourceCache.put(digest, index)
+        return index
+
+
+    # The PathIndex of a file's keys, cached with its sourceIndex(). None if the file can't be parsed.
+    def pathIndex(data):
+        try:
+            return YAML2ST.sourceIndex(data)[2]
+        except ValueError: # Not YAML or JSON
+            return None
+
+
+    # Helper
+    # Yields the rows of df whose values differ from the original flattened data as (key, st_value, breadcrumb)
+    def __changedRows(original, df):
+        for key, st_value, breadcrumb in YAML2ST.__exportRows(df):
+            if breadcrumb not in original or str(original[breadcrumb][1]) != YAML2ST.valueText(st_value):
+                yield key, st_value, breadcrumb
+
+
+    # Helper
+    # The text of a value as a YAML scalar. Quoted values are escaped so they stay on the line of their key.
+    def __patchValue(st_value):
+        text, bare = YAML2ST.__exportValue(st_value)
+        return text if bare else json.dumps(text, ensure_ascii=False)
+
+
+    # Outputs a JSON-patch-style change set of the values of df that differ from the uploaded file
+    ## Returns [{"op": "replace", "path": "/a/b", "value": ...}]. Rows not in the file are "add" ops. Values are JSON, e.g. dates as ISO 8601 text
+    ## upload: the origional uploadedFile used to create df, or its bytes
+    ## df: the changed values of the uploaded file
+    def changeSet(upload, df):
+        data = upload if isinstance(upload, bytes) else upload.getvalue()
+        original, spans, paths = YAML2ST.sourceIndex(data)
+        changes = []
+        for key, st_value, breadcrumb in YAML2ST.__changedRows(original, df):
+            path = "/" + "/".join(crumb.replace("~", "~0").replace("/", "~1") for crumb in paths.path(breadcrumb))
+            changes.append({'op': 'replace' if breadcrumb in original else 'add', 'path': path, 'value': YAML2ST.__jsonValue(st_value)})
+        return changes
+
+
+    # Outputs the text of the uploaded file with only the values of df that changed patched in. Every other byte is kept.
+    ## Falls back to a full export if a changed value can't be placed in the text, e.g. an alias or a row not in the file. 
+    ## upload: the origional uploadedFile used to create df, or its bytes
+    ## df: the changed values of the uploaded file
+    def patchExport(upload, df):
+        data = upload if isinstance(upload, bytes) else upload.getvalue()
+        dataString = data.decode("utf-8")
+        original, spans, paths = YAML2ST.sourceIndex(data)
+
+        patches = []
+        if spans is not None:
+            for key, st_value, breadcrumb in YAML2ST.__changedRows(original, df):
+                if breadcrumb not in spans:
+                    patches = None
+                    break
+                patches.append((spans[breadcrumb], YAML2ST.__patchValue(st_value)))
+
+        # Rows that share a span, e.g. of a breadcrumb a #FORCE key= override repeats, can't both be patched in
+        if patches:
+            patches.sort()
+            if any(start < end for ((_, end), _), ((start, _), _) in zip(patches, patches[1:])):
+                patches = None
+        if spans is None or patches is None:
+            newFile = io.StringIO()
+            YAML2ST.writeExport(df, newFile, YAML2ST.commentIndex(data), paths)
+            return newFile.getvalue()
+
+        chunks = []
+        last = 0
+        for (start, end), text in patches:
+            value = dataString[start:end]
+            if start > 0 and dataString[start-1] == ':':
+                text = ' ' + text # An empty value
+            chunks.append(dataString[last:start])
+            chunks.append(text + value[len(value.rstrip()):]) # Keeps the line break that ends a block scalar
+            last = end
+        chunks.append(dataString[last:])
+        return "".join(chunks)
+
+
+    # The rows of a variant of a batch export: the template's values with the variant's values in their place
+    ## Values of the variant that aren't in the template are added after the template's. Returns a list of (key, st_value, breadcrumb)
+    ## original: the flattened template from flattenData()
+    ## variant: a dict of {breadcrumb: value}, or a DataFrame, BuildRows, or the records of build() with the values to change
+    ## paths: the template's PathIndex, for the keys of a dict's breadcrumbs
+    def variantRows(original, variant, paths=None):
+        if isinstance(variant, dict):
+            paths = PathIndex() if paths is None else paths
+            overrides = {breadcrumb: (paths.keys[paths.node(breadcrumb)], value) for breadcrumb, value in variant.items()}
+        else:
+            overrides = {breadcrumb: (key, st_value) for key, st_value, breadcrumb in YAML2ST.__exportRows(variant)}
+        rows = [(key, overrides.pop(breadcrumb)[1] if breadcrumb in overrides else value, breadcrumb) for breadcrumb, (key, value) in original.items()]
+        rows.extend((key, value, breadcrumb) for breadcrumb, (key, value) in overrides.items())
+        return rows
+
+
+    # The hash of an export of df's rows from the bytes of their file with the export's options, e.g. to cache the export by
+    ## Returns the hash and df's rows as a list, a snapshot that later changes to df don't change
+    def exportDigest(data, df, *options):
+        rows = list(YAML2ST.__exportRows(df))
+        hasher = hashlib.sha256(data)
+        hasher.update(repr(options).encode('utf-8'))
+        hasher.update(repr(rows).encode('utf-8'))
+        return hasher.hexdigest(), rows
+
+
+    # Exports the snapshot of exportFuture() in a thread or process of its pool. Returns exportBytes()'s (data, fileName, link)
+    def exportTask(data, fileName, rows, URL, incremental):
+        data, fname, link = exportBytes(data, rows, URL, incremental)
+        return data, fileName.split(".", 1)[0] + ".yaml", link
 
-            YAML2ST.recursiveExport(df[1:], breadcrumbs, newFile, line_to_comment, line)
+
+    # Sets the comments and PathIndex of the template in a process of a batch export's pool, so they're sent to each process once
+    def setBatchComments(line_to_comment, paths=None):
+        global batchComments, batchPaths
+        batchComments = line_to_comment
+        batchPaths = paths
+
+
+    # Renders the rows of a variant of a batch export to the bytes of its file and its share link
+    ## line_to_comment, paths: the template's comments and PathIndex. Default to the ones set by setBatchComments()
+    def renderVariant(rows, URL, line_to_comment=None, paths=None):
+        if line_to_comment is None:
+            line_to_comment, paths = batchComments, batchPaths
+        newFile = io.StringIO()
+        YAML2ST.writeExport(rows, newFile, line_to_comment, paths)
+        data = newFile.getvalue().encode("utf-8")
+        return data, str(URL + "?YAML2URL=" + YAML2ST.urlEncode(data))
 
 
     # Strips the spaces in a line except if within ""
@@ -173,11 +1379,492 @@ class YAML2ST:
         return '"'.join(lst)
 
     
+    # Compresses the bytes of a share link's payload to base64url
+    def __packLink(payload, codec):
+        if codec == 'lzma':
+            import lzma
+            return 'x', base64.urlsafe_b64encode(lzma.compress(payload, preset=9)).decode('ascii').rstrip('=')
+        return 'z', base64.urlsafe_b64encode(zlib.compress(payload, 9)).decode('ascii').rstrip('=')
+
+
+    # Decompresses a share link's base64url payload. Stops at MAXLINKBYTES, so a small link can't expand to fill memory.
+    def __unpackLink(codec, text):
+        import lzma
+        try:
+            payload = base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+            if codec == 'x':
+                decompressor = lzma.LZMADecompressor()
+                data = decompressor.decompress(payload, max_length=MAXLINKBYTES + 1)
+            else:
+                decompressor = zlib.decompressobj()
+                data = decompressor.decompress(payload, MAXLINKBYTES + 1)
+        except (ValueError, zlib.error, lzma.LZMAError):
+            raise ValueError(LINKERROR) from None
+        if len(data) > MAXLINKBYTES:
+            raise ValueError("YAML2ST: The share link's file is over the " + str(MAXLINKBYTES) + " bytes of MAXLINKBYTES.")
+        if not decompressor.eof:
+            raise ValueError(LINKERROR)
+        return data
+
+
     # Input a YAML via Streamlit's UploadedFile and this outputs string for sharing
-    def urlEncode(upload): 
-        stringio = upload.getvalue()
-        params = urllib.parse.quote_plus(stringio)
-        return str(params)
+    ## upload: an UploadedFile, or the bytes of a file
+    ## codec: 'zlib' or 'lzma' for a compressed, versioned link. None for the original link of the whole, URL quoted file.
+    def urlEncode(upload, codec=SHARELINKCODEC): 
+        stringio = upload if isinstance(upload, bytes) else upload.getvalue()
+        if codec is None:
+            import urllib.parse
+            params = urllib.parse.quote_plus(stringio)
+            return str(params)
+        codec, payload = YAML2ST.__packLink(stringio, codec)
+        return 'y2s' + str(SHARELINKVERSION) + '.f' + codec + '.' + payload
+
+
+    # Outputs a share string of only the values of df that changed from the base file. Decoding it needs the same base file.
+    ## upload: the origional uploadedFile used to create df, or its bytes
+    ## df: the changed values of the uploaded file
+    def urlEncodeDelta(upload, df, codec=SHARELINKCODEC):
+        base = upload if isinstance(upload, bytes) else upload.getvalue()
+        original = YAML2ST.sourceIndex(base)[0]
+        changes = {}
+        for key, st_value, breadcrumb in YAML2ST.__changedRows(original, df):
+            changes[breadcrumb] = st_value
+        delta = {'base': hashlib.sha256(base).hexdigest(), 'changes': changes}
+        codec, payload = YAML2ST.__packLink(json.dumps(delta, default=YAML2ST.valueText, separators=(',', ':')).encode('utf-8'), codec)
+        return 'y2s' + str(SHARELINKVERSION) + '.d' + codec + '.' + payload
+
+
+    # Outputs the bytes of a YAML file from a share string. Detects the link's version, so the original links still decode. 
+    ## param: the value of the YAML2URL URL param
+    ## base: the base UploadedFile, or its bytes, of a delta link
+    ## Raises ValueError if the link is truncated or corrupt, or is a delta link of another or no base file
+    def urlDecodeBytes(param, base=None):
+        match = SHARELINK.match(param)
+        if match is None: # The original link of the whole file
+            return bytes(param, 'utf-8')
+        version, kind, codec, payload = match.groups()
+        if int(version) > SHARELINKVERSION:
+            raise ValueError("YAML2ST: The share link's version " + version + " is newer than this YAML2ST's version " + str(SHARELINKVERSION) + ".")
+        data = YAML2ST.__unpackLink(codec, payload)
+        if kind == 'f':
+            return data
+
+        # Apply a delta to its base file
+        try:
+            delta = json.loads(data.decode('utf-8'))
+            baseDigest, changes = delta['base'], dict(delta['changes'])
+        except (ValueError, KeyError, TypeError):
+            raise ValueError(LINKERROR) from None
+        if base is None:
+            raise ValueError("YAML2ST: The share link only has the changes of a file. Its base file is needed to decode it.")
+        base = base if isinstance(base, bytes) else base.getvalue()
+        if hashlib.sha256(base).hexdigest() != baseDigest:
+            raise ValueError("YAML2ST: The share link's changes are not of this base file.")
+        original, spans, paths = YAML2ST.sourceIndex(base)
+        rows = BuildRows()
+        for breadcrumb, (key, value) in original.items():
+            rows.append(key, changes.get(breadcrumb, value), breadcrumb)
+        newFile = io.StringIO()
+        YAML2ST.writeExport(rows, newFile, YAML2ST.commentIndex(base), paths)
+        return newFile.getvalue().encode('utf-8')
+
+
+    # Helper
+    # The path of a share link's file in the disk tier
+    def __linkPath(key):
+        return os.path.join(LINKCACHEDIR, key + '.y2s')
+
+
+    # Helper
+    # If LINKCACHEDIR can be trusted: it's owned by the server's user and no one else can write to it
+    def __linkDirSafe():
+        try:
+            status = os.stat(LINKCACHEDIR)
+        except OSError:
+            return False
+        if hasattr(os, 'getuid') and status.st_uid != os.getuid():
+            return False
+        return not status.st_mode & 0o022
+
+
+    # Helper
+    # Reads a SharedDocument from the disk tier, or None. The files are JSON, with the values of the plan as in a snapshot.
+    def __readLinkDisk(key):
+        if not YAML2ST.__linkDirSafe():
+            return None
+        path = YAML2ST.__linkPath(key)
+        try:
+            with open(path, 'rb') as f:
+                record = json.load(f)
+            os.utime(path) # The disk tier evicts the least recently used files
+            if record['version'] != SHARELINKVERSION:
+                return None
+            plan = record['plan']
+            if plan is not None:
+                plan = tuple(PlanStep(*step[:11], None if step[11] is None else MappingProxyType(step[11]), *step[12:]) 
+                             for step in YAML2ST.__snapshotDecode(plan))
+            index = CommentIndex()
+            lines, index.texts, trailing, index.trailingTexts = record['comments']
+            index.lines, index.trailing = array('q', lines), array('q', trailing)
+            return SharedDocument(base64.b64decode(record['data']), record['digest'], plan, index)
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+
+    # Helper
+    # Writes a SharedDocument to the disk tier, then removes its least recently used files over LINKCACHEFILES
+    def __writeLinkDisk(key, document):
+        import tempfile
+        comments = document.comments
+        try:
+            plan = None if document.plan is None else YAML2ST.__snapshotEncode([list(step) for step in document.plan], [False])
+        except TypeError: # A #FORCE param of a type JSON can't hold, e.g. a set, so the link is only kept in memory
+            return
+        record = {'version': SHARELINKVERSION, 'data': base64.b64encode(document.data).decode('ascii'), 'digest': document.digest, 'plan': plan,
+                  'comments': [comments.lines.tolist(), comments.texts, comments.trailing.tolist(), comments.trailingTexts]}
+        try:
+            os.makedirs(LINKCACHEDIR, mode=0o700, exist_ok=True)
+            if not YAML2ST.__linkDirSafe():
+                return
+            fd, tmp = tempfile.mkstemp(dir=LINKCACHEDIR, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(record, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp, YAML2ST.__linkPath(key)) # Another process never reads a partial file
+            files = [entry for entry in os.scandir(LINKCACHEDIR) if entry.name.endswith('.y2s')]
+            if len(files) > LINKCACHEFILES:
+                files.sort(key=lambda entry: entry.stat().st_mtime)
+                for entry in files[:len(files) - LINKCACHEFILES]:
+                    os.remove(entry.path)
+        except OSError: # The disk tier is only a cache
+            pass
+
+
+    # Decodes a share link once for every session that opens it, and compiles its file's build plan and comments.
+    ## Kept in linkCache by the hash of the link, and in LINKCACHEDIR if it is set. Returns a SharedDocument
+    ## param: the value of the YAML2URL URL param
+    ## base: the base UploadedFile, or its bytes, of a delta link
+    def sharedDocument(param, base=None):
+        key = hashlib.sha256(param.encode('utf-8')).hexdigest()
+        if base is not None:
+            key = hashlib.sha256((key + hashlib.sha256(base if isinstance(base, bytes) else base.getvalue()).hexdigest()).encode('ascii')).hexdigest()
+
+        document = linkCache.get(key)
+        if document is None:
+            with linkLocksLock:
+                lock = linkLocks.setdefault(key, threading.Lock())
+            try:
+                with lock:
+                    document = linkCache.get(key) # Decoded by another session while this one waited
+                    if document is None and LINKCACHEDIR:
+                        document = YAML2ST.__readLinkDisk(key)
+                        if document is not None:
+                            linkCache.put(key, document)
+                    if document is None:
+                        data = YAML2ST.urlDecodeBytes(param, base)
+                        plan = uploadToPlan(data, HeadlessRenderer())
+                        document = SharedDocument(data, hashlib.sha256(data).hexdigest(), plan or None, YAML2ST.commentIndex(data))
+                        linkCache.put(key, document)
+                        if LINKCACHEDIR:
+                            YAML2ST.__writeLinkDisk(key, document)
+            finally:
+                with linkLocksLock:
+                    linkLocks.pop(key, None)
+
+        # So build() and export() of the file find its plan and comments, even if other files pushed them out of their caches
+        if document.plan is not None and document.digest not in planCache:
+            planCache.put(document.digest, document.plan)
+        if document.digest not in commentCache:
+            commentCache.put(document.digest, document.comments)
+        return document
+
+
+    # Helper
+    # A value as JSON. Sets special[0] if the value has types JSON doesn't, which are tagged as {"$y2s": type, "v": text or items}
+    def __snapshotEncode(value, special):
+        if value is None or isinstance(value, (bool, int, float, str)):
+            return value
+        if isinstance(value, list):
+            return [YAML2ST.__snapshotEncode(item, special) for item in value]
+        if isinstance(value, (dict, MappingProxyType)) and '$y2s' not in value and all(isinstance(key, str) for key in value):
+            return {key: YAML2ST.__snapshotEncode(item, special) for key, item in value.items()}
+        special[0] = True
+        if isinstance(value, datetime):
+            return {'$y2s': 'datetime', 'v': value.isoformat()}
+        if isinstance(value, date):
+            return {'$y2s': 'date', 'v': value.isoformat()}
+        if isinstance(value, time):
+            return {'$y2s': 'time', 'v': value.isoformat()}
+        if isinstance(value, tuple):
+            return {'$y2s': 'tuple', 'v': [YAML2ST.__snapshotEncode(item, special) for item in value]}
+        if isinstance(value, (dict, MappingProxyType)):
+            return {'$y2s': 'dict', 'v': [[YAML2ST.__snapshotEncode(key, special), YAML2ST.__snapshotEncode(item, special)] for key, item in value.items()]}
+        if type(value).__name__ == 'Decimal':
+            return {'$y2s': 'decimal', 'v': str(value)}
+        raise TypeError("YAML2ST: Can't snapshot a value of type " + type(value).__name__ + ".")
+
+
+    # Helper
+    # A value from __snapshotEncode()
+    def __snapshotDecode(value):
+        if isinstance(value, list):
+            return [YAML2ST.__snapshotDecode(item) for item in value]
+        if not isinstance(value, dict):
+            return value
+        tag = value.get('$y2s')
+        if tag is None:
+            return {key: YAML2ST.__snapshotDecode(item) for key, item in value.items()}
+        if tag == 'datetime':
+            return datetime.fromisoformat(value['v'])
+        if tag == 'date':
+            return date.fromisoformat(value['v'])
+        if tag == 'time':
+            return time.fromisoformat(value['v'])
+        if tag == 'tuple':
+            return tuple(YAML2ST.__snapshotDecode(item) for item in value['v'])
+        if tag == 'dict':
+            return {YAML2ST.__snapshotDecode(key): YAML2ST.__snapshotDecode(item) for key, item in value['v']}
+        if tag == 'decimal':
+            from decimal import Decimal
+            return Decimal(value['v'])
+        raise ValueError("YAML2ST: Unknown snapshot value type " + str(tag) + ".")
+
+
+    # The bytes of a binary snapshot of a file's build plan and the widget values of df. See SNAPSHOTMAGIC
+    ## upload: an UploadedFile, its bytes, or a Snapshot
+    ## df: the widget values, e.g. from build(). Defaults to the file's default values
+    ## Raises ValueError if the file can't be built
+    def snapshotBytes(upload, df=None):
+        data = upload if isinstance(upload, bytes) else upload.getvalue()
+        renderer = HeadlessRenderer()
+        plan = uploadToPlan(data, renderer)
+        if not plan:
+            raise ValueError(renderer.errors[0] if renderer.errors else "YAML2ST: The file has no data.")
+        rows = list(YAML2ST.__exportRows(df)) if df is not None else YAML2ST.replayHeadless(plan, BuildRows(), {}).records()
+
+        columns = {name: [] for name in SNAPSHOTCOLUMNS}
+        arrays = {name: array(typecode) for name, typecode in SNAPSHOTARRAYS.items()}
+        fixups = {}
+        special = [False]
+
+        def add(column, value):
+            special[0] = False
+            values = columns[column]
+            values.append(YAML2ST.__snapshotEncode(value, special))
+            if special[0]:
+                fixups.setdefault(column, []).append(len(values) - 1)
+
+        derived = {'key': True, 'breadcrumb': True, 'label': True}
+        wholeKwargs = []
+        steps = {}
+        pathIndex = PathIndex()
+        for index, step in enumerate(plan):
+            node = pathIndex.add(step.path)
+            arrays['kind'].append(SNAPSHOTKINDS.index(step.kind))
+            arrays['depth'].append(step.depth)
+            arrays['index'].append(step.index)
+            arrays['node'].append(node)
+            for column in ('key', 'breadcrumb', 'widget', 'label', 'value', 'options', 'decFormat', 'error'):
+                add(column, getattr(step, column))
+            add('params', [list(pair) for pair in step.params]) # The pairs are always tuples
+            derived['key'] = derived['key'] and step.key == pathIndex.keys[node]
+            derived['breadcrumb'] = derived['breadcrumb'] and step.breadcrumb == pathIndex.breadcrumbs[node]
+            derived['label'] = derived['label'] and step.label == step.key
+
+            # A widget's kwargs are made from its label, params, options, and value, as the plan made them, but for those that differ
+            if step.kind == 'widget':
+                kwargs = YAML2ST.__callKwargs(step.widget, step.label, step.value, step.options, step.index, step.params, step.breadcrumb)[0]
+                derivable = json.dumps(YAML2ST.__snapshotEncode(kwargs, [False])) == json.dumps(YAML2ST.__snapshotEncode(dict(step.kwargs), [False]))
+            else:
+                derivable = step.kwargs is None
+            if not derivable:
+                wholeKwargs.append(index)
+                add('kwargs', step.kwargs)
+
+            if step.kind == 'hide' or (step.kind == 'widget' and not step.error):
+                steps[step.breadcrumb] = index
+
+        arrays['nodeParent'].extend(pathIndex.parents[1:])
+        columns['nodeKey'] = pathIndex.keys[1:]
+
+        # The values that differ from their step's default, which build() draws the widgets with
+        changed = []
+        for row, (key, st_value, breadcrumb) in enumerate(rows):
+            add('rowValue', st_value)
+            index = steps.get(breadcrumb, -1)
+            if index != -1 and plan[index].key != key:
+                index = -1
+            arrays['rowStep'].append(index)
+            if index == -1:
+                add('rowKey', key)
+                add('rowBreadcrumb', breadcrumb)
+            elif YAML2ST.stepDefault(plan[index]) != st_value:
+                changed.append([index, row])
+
+        derived = [column for column, derivable in derived.items() if derivable]
+        meta = {'name': getattr(upload, 'name', 'config.yaml'), 'steps': len(plan), 'rows': len(rows), 'changed': changed, 'fixups': fixups,
+                'derived': derived, 'wholeKwargs': wholeKwargs}
+        sections = [('meta', json.dumps(meta).encode('utf-8')), ('source', data)]
+        for name, values in arrays.items():
+            if sys.byteorder == 'big':
+                values.byteswap()
+            sections.append((name, values.tobytes()))
+        for name in SNAPSHOTCOLUMNS:
+            if name not in derived:
+                sections.append((name, json.dumps(columns[name], ensure_ascii=False, separators=(',', ':')).encode('utf-8')))
+
+        # The sections follow the header and the table, each 8-byte aligned so its arrays can be cast in place
+        offset = SNAPSHOTHEADER.size + SNAPSHOTSECTION.size * len(sections)
+        table, body = [], []
+        for name, section in sections:
+            padding = -offset % 8
+            body.append(b'\0' * padding)
+            offset += padding
+            table.append(SNAPSHOTSECTION.pack(name.encode('ascii'), offset, len(section)))
+            body.append(section)
+            offset += len(section)
+        return b''.join([SNAPSHOTHEADER.pack(SNAPSHOTMAGIC, SNAPSHOTVERSION, len(sections))] + table + body)
+
+
+    # Loads a Snapshot from the bytes, or a memory map, of a binary snapshot, without parsing YAML
+    ## Raises ValueError if it isn't a snapshot, or is of a newer version of YAML2ST
+    def snapshotFromBuffer(buffer):
+
+        # The objects are all kept, so collecting garbage while they're made would only slow the load
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            return YAML2ST.__decodeSnapshot(buffer)
+        finally:
+            if collecting:
+                gc.enable()
+
+
+    # Helper
+    # Decodes the sections of a snapshot to a Snapshot
+    def __decodeSnapshot(buffer):
+        view = memoryview(buffer)
+        sections = {}
+        try:
+            magic, version, count = SNAPSHOTHEADER.unpack_from(view, 0)
+            if magic != SNAPSHOTMAGIC:
+                raise ValueError("YAML2ST: Not a snapshot.")
+            if version > SNAPSHOTVERSION:
+                raise ValueError("YAML2ST: The snapshot's version " + str(version) + " is newer than this YAML2ST's version " + str(SNAPSHOTVERSION) + ".")
+            for number in range(count):
+                name, offset, length = SNAPSHOTSECTION.unpack_from(view, SNAPSHOTHEADER.size + SNAPSHOTSECTION.size * number)
+                sections[name.rstrip(b'\0').decode('ascii')] = view[offset:offset + length]
+
+            meta = json.loads(bytes(sections['meta']))
+            source = bytes(sections['source'])
+            names = SNAPSHOTCOLUMNS if version > 1 else tuple('path' if name == 'nodeKey' else name for name in SNAPSHOTCOLUMNS)
+            ints = {}
+            for name, typecode in SNAPSHOTARRAYS.items():
+                if version == 1 and name in ('node', 'nodeParent'):
+                    continue
+                if sys.byteorder == 'big':
+                    values = array(typecode, bytes(sections[name]))
+                    values.byteswap()
+                    ints[name] = values.tolist()
+                else:
+                    cast = sections[name].cast(typecode)
+                    ints[name] = cast.tolist()
+                    cast.release()
+            columns = {name: json.loads(bytes(sections[name])) for name in names if name not in meta['derived']}
+        except (KeyError, struct.error, TypeError) as e:
+            raise ValueError("YAML2ST: Not a valid snapshot: " + str(e))
+        finally: # So a memory map can be closed
+            for section in sections.values():
+                section.release()
+            view.release()
+
+        for name, indexes in meta['fixups'].items():
+            values = columns[name]
+            for index in indexes:
+                values[index] = YAML2ST.__snapshotDecode(values[index])
+
+        pathIndex = PathIndex()
+        if version == 1:
+            nodes = list(map(pathIndex.add, columns['path']))
+        else:
+            for parent, key in zip(ints['nodeParent'], columns['nodeKey']): # Each node is added after its parent, so it gets its id again
+                pathIndex.child(parent, key)
+            nodes = ints['node']
+        paths = list(map(pathIndex.paths.__getitem__, nodes))
+        keys = list(map(pathIndex.keys.__getitem__, nodes)) if 'key' in meta['derived'] else columns['key']
+        breadcrumbs = list(map(pathIndex.breadcrumbs.__getitem__, nodes)) if 'breadcrumb' in meta['derived'] else columns['breadcrumb']
+        labels = keys if 'label' in meta['derived'] else columns['label']
+        kinds = list(map(SNAPSHOTKINDS.__getitem__, ints['kind']))
+        params = [tuple(map(tuple, pairs)) if pairs else () for pairs in columns['params']]
+        if version == 1: # The kwargs of every step, less the label and key
+            kwargs = [None if mapping is None else MappingProxyType({'label': label, **mapping, 'key': breadcrumb})
+                      for mapping, label, breadcrumb in zip(columns['kwargs'], labels, breadcrumbs)]
+            for step in meta['wholeKwargs']:
+                kwargs[step] = MappingProxyType(columns['kwargs'][step])
+        else: # The kwargs of only the steps in 'wholeKwargs'
+            callKwargs = YAML2ST.__callKwargs
+            kwargs = [None if kind != 'widget' else MappingProxyType(callKwargs(widget, label, value, options, index, pairs, breadcrumb)[0])
+                      for kind, widget, label, value, options, index, pairs, breadcrumb 
+                      in zip(kinds, columns['widget'], labels, columns['value'], columns['options'], ints['index'], params, breadcrumbs)]
+            for step, mapping in zip(meta['wholeKwargs'], columns['kwargs']):
+                kwargs[step] = None if mapping is None else MappingProxyType(mapping)
+        plan = tuple(map(PlanStep._make, zip(kinds, keys, breadcrumbs, ints['depth'], columns['widget'], labels, columns['value'],
+                                             columns['options'], ints['index'], params, columns['decFormat'], kwargs, columns['error'], paths)))
+
+        rows = BuildRows()
+        rows.values = columns['rowValue']
+        otherKeys, otherBreadcrumbs = iter(columns['rowKey']), iter(columns['rowBreadcrumb'])
+        rows.keys = [keys[index] if index != -1 else next(otherKeys) for index in ints['rowStep']]
+        rows.breadcrumbs = [breadcrumbs[index] if index != -1 else next(otherBreadcrumbs) for index in ints['rowStep']]
+
+        # So export() and a rebuild of the source file don't parse it
+        planCache.put(hashlib.sha256(source).hexdigest(), plan)
+        return Snapshot(meta['name'], source, plan, rows, meta['changed'], pathIndex)
+
+
+    # The build plan of a Snapshot, with the widgets that the snapshot changed drawn with its values
+    def snapshotPlan(snapshot):
+        if not snapshot.changed:
+            return snapshot.plan
+        plan = list(snapshot.plan)
+        for index, row in snapshot.changed:
+            plan[index] = YAML2ST.__withValue(plan[index], snapshot.rows.values[row])
+        return plan
+
+
+    # Flattens the data to its key value pairs in order. Returns {breadcrumb: (key, value)}
+    ## paths: a PathIndex to add the paths of the keys to
+    def flattenData(dataDict, paths=None):
+        flat = {}
+        paths = PathIndex() if paths is None else paths
+        breadcrumbs = paths.breadcrumbs
+        stack = [(0, iter(dataDict.items()))]
+        while stack:
+            parent, items = stack[-1]
+            for key, value in items:
+                node = paths.child(parent, str(key))
+                if isinstance(value, dict):
+                    stack.append((node, iter(value.items())))
+                    break
+                flat[breadcrumbs[node]] = (key, value)
+            else:
+                stack.pop()
+        return flat
+
+
+    # The C-accelerated (libyaml) loader when PyYAML has it. PyYAML is imported on first use.
+    def safeLoader():
+        import yaml
+        return getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+
+    # Parses a YAML data string to its data and its composed root node in a single pass. Raises yaml.YAMLError.
+    def composeDocument(dataString):
+        loader = YAML2ST.safeLoader()(dataString)
+        try:
+            node = loader.get_single_node()
+            return dict(loader.construct_document(node)), node
+        finally:
+            loader.dispose()
 
 
     # Dev helper to convert a streamlit uploaded file to a dataString
@@ -229,8 +1916,8 @@ class YAML2ST:
 
 
     # Helper
-    # The logic for parameter formation and then its creation 
-    def __paramLogic(literalParam, key, value, breadcrumb, df, stObject):
+    # The logic for parameter formation. Resolves the params into an immutable widget step of the build plan.
+    def __paramLogic(literalParam, key, value, breadcrumb, path=()):
         
         label=""
         if 'label' in literalParam: 
@@ -240,6 +1927,7 @@ class YAML2ST:
             label = key
         
         index = 0
+        options = None
 
         if 'options' in literalParam: 
             __paramOptions = ast.literal_eval(literalParam["options"])
@@ -266,10 +1954,11 @@ class YAML2ST:
         
         # For number values, we need to ensure we provide the correct number's type to the input widget
         decFormat = ""
-        if literalParam['w'] == 'number_input' and YAML2ST.__representsInt(value):
+        kind = YAML2ST.classify(value) if literalParam['w'] == 'number_input' else ''
+        if kind == 'int':
             if 'type' not in literalParam:
                 literalParam['type'] = "int"
-        elif literalParam['w'] == 'number_input' and YAML2ST.__representsDecimal(value):
+        elif kind == 'decimal':
             decFormat, decStep = YAML2ST.__calcPrecision(str(value))
             if 'format' not in literalParam and PERSISTDECIMAL:
                 literalParam['format'] = "'"+str(decFormat)+"'"
@@ -280,172 +1969,588 @@ class YAML2ST:
         
         # YAML2ST param: Persist the type [int, string, float, etc.] of the data
         ## Based on the statement that "All numerical arguments must be of the same type" in streamlit
+        converter = None
         if "type" in literalParam:
-
-            dataType = literalParam["type"]
+            converter = PARAMTYPES.get(str(literalParam["type"]).strip('"\''))
             del literalParam["type"]
 
-            for param in literalParam:
-                try: 
-                    literalParam[param] = eval(str(dataType+'(\"'+str(literalParam[param])+'\")'))
-                except:
-                    pass
-        
-        # For all params but w, form a code command statement
-        wParameters = "" 
+        # For all params but w, convert the literals to typed keyword arguments
+        widget = literalParam['w']
+        kwargs = {'label': label}
         for ___k, ___v in literalParam.items():
             if ___k != 'w':
-                wParameters = wParameters + str(___k) + "=" + str(___v) + ", "
+                kwargs[___k] = YAML2ST.__convertParam(___v, converter)
+        params = tuple((___k, ___v) for ___k, ___v in kwargs.items() if ___k != 'label')
         
-        # Code command statement build 
-        if literalParam['w'] == 'datetime_input': # A custom input widget. Doesn't use literals
-            date = value
+        # Keyword arguments build via the widget's call shape
+        if widget != 'datetime_input' and 'options' in WIDGETCALLS.get(widget, ('value',)):
+            options = value
+        kwargs, error = YAML2ST.__callKwargs(widget, label, value, options, index, params, breadcrumb)
+
+        return PlanStep('widget', key, breadcrumb, 0, widget, label, value, options, index, params, decFormat, MappingProxyType(kwargs), error, path)
+
+
+    # Helper
+    # The keyword arguments of a widget's call: its label, its #FORCE params, the arguments of its call shape in WIDGETCALLS, then its key.
+    ## Returns (kwargs, error). error is the text of the call if a checkbox's value isn't a bool, whose kwargs then have no value.
+    def __callKwargs(widget, label, value, options, index, params, breadcrumb):
+        if widget == 'datetime_input': # A custom input widget. Doesn't use literals
+            return {}, ""
+        error = ""
+        kwargs = {'label': label}
+        kwargs.update(params)
+        shape = WIDGETCALLS.get(widget, ('value',))
+        if 'options' in shape:
+            kwargs['options'] = options
+        if 'index' in shape:
+            kwargs['index'] = index
+        if 'value' in shape:
+            if widget == 'checkbox':
+                try:
+                    kwargs['value'] = YAML2ST.__checkboxValue(value)
+                except ValueError:
+                    error = YAML2ST.__callText(widget, dict(kwargs, value=value, key=breadcrumb))
+            else:
+                kwargs['value'] = value
+        kwargs['key'] = breadcrumb
+        return kwargs, error
+
+
+    # Helper
+    # Converts a #FORCE param's literal to its Python value, or to the forced type if it can be
+    def __convertParam(literal, converter):
+        value = literal
+        if isinstance(literal, str):
+            try:
+                value = ast.literal_eval(literal)
+            except (ValueError, SyntaxError):
+                pass
+        if converter is not None:
+            try:
+                value = converter(value)
+            except (ValueError, TypeError):
+                pass
+        return value
+
+
+    # Helper
+    # A checkbox's value must be a boolean or its text
+    def __checkboxValue(value):
+        if isinstance(value, bool):
+            return value
+        if value == 'True' or value == 'true':
+            return True
+        if value == 'False' or value == 'false':
+            return False
+        raise ValueError(value)
+
+
+    # Helper
+    # The text of a widget call, for messages
+    def __callText(widget, kwargs):
+        return 'stObject.' + widget + '(' + ', '.join(str(___k) + '=' + repr(___v) for ___k, ___v in kwargs.items()) + ')'
+
+
+    # Helper
+    # Validates the keyword arguments of a widget against the callable's signature, once per widget type and stObject type
+    ## Returns the names of any keyword arguments that the widget doesn't take
+    def __unknownParams(stObject, widget, call, kwargs):
+        signatureKey = (type(stObject), widget)
+        accepted = widgetSignatures.get(signatureKey)
+        if accepted is None:
+            import inspect
+            try:
+                parameters = inspect.signature(call).parameters.values()
+                if any(parameter.kind == parameter.VAR_KEYWORD for parameter in parameters):
+                    accepted = True
+                else:
+                    accepted = frozenset(parameter.name for parameter in parameters)
+            except (TypeError, ValueError): # No signature to check
+                accepted = True
+            widgetSignatures.put(signatureKey, accepted)
+        if accepted is True:
+            return []
+        return [___k for ___k in kwargs if ___k not in accepted]
+
+
+    # Helper
+    # Draws a widget step of the build plan and stores its value
+    ## onChange: if given, the widget calls onChange(step) when the user changes it, and rows may be None to not store the value
+    ## Returns False if the widget couldn't be drawn
+    def __replayWidget(step, rows, stObject, onChange=None):
+
+        if step.widget == 'datetime_input': # A custom input widget. Doesn't use literals
+            date = step.value
+            callback = {} if onChange is None else {'on_change': onChange, 'args': (step,)}
             col1, col2 = stObject.columns(2)
-            value = datetime.combine(col1.date_input(key + ' > date', value=date, key=(breadcrumb + ' > date')), col2.time_input(key + ' > time', value=date, key=(breadcrumb + ' > time')))
-        elif literalParam['w'] == 'selectbox' or literalParam['w'] == 'radio':
-            __literalCommand = str('stObject.' + literalParam['w'] + '(label=label, options=value, ' + wParameters + 'index=index, key=breadcrumb)')
-        elif literalParam['w'] == 'select_slider' or literalParam['w'] == 'multiselect': #has no index param but has options param
-            __literalCommand = str('stObject.' + literalParam['w'] + '(label=label, options=value, ' + wParameters + 'key=breadcrumb)')
-        elif literalParam['w'] == 'checkbox':
-            __literalCommand = str('stObject.' + literalParam['w'] + '(label=label, value=eval(value), ' + wParameters + 'key=breadcrumb)')
+            value = datetime.combine(col1.date_input(step.key + ' > date', value=date, key=(step.breadcrumb + ' > date'), **callback), col2.time_input(step.key + ' > time', value=date, key=(step.breadcrumb + ' > time'), **callback))
+            if rows is not None:
+                rows.append(step.key, value, step.breadcrumb)
+            return True
+
+        if step.error:
+            stObject.error("YAML2ST: Couldn't execute the input widget: \n\n" + step.error + "\n\n Check your YAML and the Streamlit API for errors.")
+            return False
+
+        try:
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Y2S EXECUTING WIDGET: " + YAML2ST.__callText(step.widget, step.kwargs))
+            call = getattr(stObject, step.widget)
+            unknown = YAML2ST.__unknownParams(stObject, step.widget, call, step.kwargs)
+            if unknown:
+                raise TypeError("Unknown params: " + ", ".join(unknown))
+            value = call(**step.kwargs) if onChange is None else call(on_change=onChange, args=(step,), **step.kwargs)
+        except: 
+            stObject.error("YAML2ST: Couldn't execute the input widget: \n\n" + YAML2ST.__callText(step.widget, step.kwargs) + "\n\n Check your YAML and the Streamlit API for errors.")
+            return False
+
+        if rows is None:
+            return True
+
+        # Will enforce the decimal format in the df since floats, as a Decimal
+        if step.decFormat:
+            value = YAML2ST.decimalValue(value, step.decFormat)
+        rows.append(step.key, value, step.breadcrumb)
+        return True
+
+
+    # Draws a compiled build plan to the streamlit object. The plan holds no state so it can be replayed each rerun.
+    ## plan: the steps from compilePlan()
+    ## rows: a BuildRows for where the streamlit input widget value updates are sent
+    ## stObject: a streamlit object on where to write the input widgets to
+    def replayPlan(plan, rows, stObject):
+
+        hooks = activeHooks()
+        for step in plan:
+
+            if step.kind == 'header':
+                
+                # Deduce the proper header style for output
+                stObject.markdown('<p class="h' + str(step.depth) + '">' + step.key + '</p>', unsafe_allow_html=True)
+
+            elif step.kind == 'hide':
+                rows.append(step.key, step.value, step.breadcrumb)
+
+            else:
+                YAML2ST.__replayWidget(step, rows, stObject)
+                if hooks:
+                    count(step.widget)
+
+        return rows
+
+
+    # Draws a compiled build plan to the streamlit object with each widget's value kept in store by its on_change callback,
+    # so no rows are collected. Widgets the user hasn't changed keep their default values from the store's layout, and the
+    # changed ones are drawn with their values in store, which Streamlit forgets if a run didn't draw them e.g. a file uploaded again.
+    ## store: the ValueStore of the plan's file
+    ## state: the dict-like store of the widgets' values e.g. st.session_state
+    def replayStore(plan, store, stObject, state):
+
+        onChange = functools.partial(store.widgetChanged, state)
+        hooks = activeHooks()
+        changed = store.changed
+        for step in plan:
+
+            if step.kind == 'header':
+                stObject.markdown('<p class="h' + str(step.depth) + '">' + step.key + '</p>', unsafe_allow_html=True)
+
+            elif step.kind == 'widget':
+                if changed and step.breadcrumb in changed:
+                    step = YAML2ST.__withValue(step, changed[step.breadcrumb])
+                if not YAML2ST.__replayWidget(step, None, stObject, onChange) and not step.error:
+                    store.failed.add(step.breadcrumb)
+                if hooks:
+                    count(step.widget)
+
+        return store
+
+
+    # The value a widget step returns when drawn untouched. Lets a section that isn't drawn still fill its rows.
+    def stepDefault(step):
+        if step.kind == 'hide':
+            return step.value
+        kwargs = step.kwargs
+        options = list(step.options) if step.options is not None else []
+        if step.widget == 'datetime_input': # Its time_input has minutes
+            value = step.value.replace(second=0, microsecond=0) if isinstance(step.value, datetime) else step.value
+        elif step.widget == 'text_input' or step.widget == 'text_area':
+            value = kwargs.get('value', step.value)
+            value = None if value is None else str(value)
+        elif step.widget == 'selectbox' or step.widget == 'radio':
+            value = options[step.index] if 0 <= step.index < len(options) else None
+        elif step.widget == 'select_slider':
+            value = kwargs.get('value', options[0] if options else None)
+        elif step.widget == 'multiselect':
+            value = list(kwargs.get('default') or [])
+        elif step.widget == 'date_input' and isinstance(kwargs.get('value'), datetime):
+            value = kwargs['value'].date()
+        elif step.widget == 'time_input' and isinstance(kwargs.get('value'), datetime):
+            value = kwargs['value'].time()
         else:
-            __literalCommand = str('stObject.' + literalParam['w'] + '(label=label, value=value, ' + wParameters + 'key=breadcrumb)')
-        
-        # Launch and storage
-        if literalParam['w'] != 'datetime_input': 
+            value = kwargs.get('value', step.value)
+        if step.decFormat:
+            value = YAML2ST.decimalValue(value, step.decFormat)
+        return value
+
+
+    # Helper
+    # A value as JSON, e.g. dates as ISO 8601 text and Decimals as numbers
+    def __jsonValue(value):
+        if isinstance(value, (datetime, date, time)):
+            return value.isoformat()
+        if type(value).__name__ == 'Decimal':
+            return float(value)
+        if isinstance(value, (list, tuple)):
+            return [YAML2ST.__jsonValue(item) for item in value]
+        if value is None or isinstance(value, (bool, int, float, str)):
+            return value
+        return str(value)
+
+
+    # Describes the widget of a step of a build plan as a JSON schema-like dict, without drawing it
+    ## e.g. {"widget": "slider", "label": "int2", "type": "integer", "default": 11, "minimum": 9, "maximum": 12}
+    ## Hidden keys have "hidden": true. A widget whose params are wrong has its message in "error" and no default.
+    def manifestEntry(step):
+        entry = {'widget': step.widget, 'label': step.label}
+        if step.kind == 'hide':
+            entry['widget'] = None
+            entry['hidden'] = True
+        if step.error:
+            entry['error'] = step.error
+            return entry
+
+        default = YAML2ST.stepDefault(step)
+        if step.decFormat: # The manifest keeps the number, not its formatted text
             try:
-                print ("Y2S EXECUTING COMMAND: " + __literalCommand + "\n   WHERE: " + "label=" + str(label) + " value=" + str(value) + " key=" + str(breadcrumb) + " index=" + str(index))
-                df.loc[len(df)+1] = key, eval(__literalCommand), breadcrumb
-            except: 
-                stObject.error("YAML2ST: Couldn't execute the literal command: \n\n" + __literalCommand + "\n\n Check your YAML and the Streamlit API for errors.")
+                default = float(default)
+            except (TypeError, ValueError):
+                pass
+        widget = entry['widget']
+        if widget in ('checkbox', 'toggle') or isinstance(default, bool):
+            entry['type'] = 'boolean'
+        elif widget == 'multiselect' or isinstance(default, list):
+            entry['type'] = 'array'
+        elif isinstance(default, int) and not step.decFormat:
+            entry['type'] = 'integer'
+        elif isinstance(default, float) or step.decFormat:
+            entry['type'] = 'number'
+        else:
+            entry['type'] = 'string'
+        formats = {'date_input': 'date', 'time_input': 'time', 'datetime_input': 'date-time', 'color_picker': 'color'}
+        if widget in formats:
+            entry['format'] = formats[widget]
+        entry['default'] = YAML2ST.__jsonValue(default)
+
+        if step.options is not None:
+            entry['enum'] = YAML2ST.__jsonValue(list(step.options))
+        params = {}
+        for ___k, ___v in step.params:
+            if ___k == 'min_value':
+                entry['minimum'] = YAML2ST.__jsonValue(___v)
+            elif ___k == 'max_value':
+                entry['maximum'] = YAML2ST.__jsonValue(___v)
+            elif ___k != 'key':
+                params[___k] = YAML2ST.__jsonValue(___v)
+        if params:
+            entry['params'] = params
+        return entry
+
+
+    # Fills rows with the default value of each step of a build plan, without a streamlit object, and describes each widget in manifest
+    ## plan: the steps from compilePlan()
+    ## rows: a BuildRows for the default values
+    ## manifest: a dict for the manifestEntry() of each breadcrumb
+    def replayHeadless(plan, rows, manifest):
+        hooks = activeHooks()
+        for step in plan:
+            if step.kind == 'header':
+                continue
+            manifest[step.breadcrumb] = YAML2ST.manifestEntry(step)
+            if not step.error:
+                rows.append(step.key, YAML2ST.stepDefault(step), step.breadcrumb)
+            if hooks and step.kind == 'widget':
+                count(step.widget)
+        return rows
 
-            # Will enforce the decimal format in the df since floats
-            if decFormat:
-                df.loc[len(df)] = key, decFormat % (df.iloc[len(df)-1, 1]), breadcrumb
 
+    # Helper
+    # A copy of a widget step that draws with value as its default, e.g. the last value of a section being reopened
+    def __withValue(step, value):
+        if step.kind != 'widget' or step.error:
+            return step
+        if step.widget == 'datetime_input':
+            return step._replace(value=value)
+        kwargs = dict(step.kwargs)
+        if step.widget == 'selectbox' or step.widget == 'radio':
+            options = list(step.options)
+            if value not in options:
+                return step
+            kwargs['index'] = options.index(value)
+        elif step.widget == 'multiselect':
+            kwargs['default'] = value
         else:
+            if step.decFormat:
+                try:
+                    value = float(value)
+                except (TypeError, ValueError):
+                    return step
+            kwargs['value'] = value
+        return step._replace(kwargs=MappingProxyType(kwargs))
+
+
+    # Groups the steps of a build plan by section, the dict at sectionDepth that each step is within, in order.
+    ## Steps above sectionDepth are in the None section. Returns [(sectionPath, steps)]
+    def planSections(plan, sectionDepth):
+        sections = OrderedDict()
+        for step in plan:
+            depth = len(step.path) if step.kind == 'header' else len(step.path) - 1
+            sectionPath = step.path[:sectionDepth] if depth >= sectionDepth else None
+            sections.setdefault(sectionPath, []).append(step)
+        return list(sections.items())
+
+
+    # Draws a compiled build plan one section at a time, building widgets only for the sections the user opens.
+    ## Values of the other sections come from their last drawn values in state, or else the plan, so the rows stay complete. 
+    ## mode: 'expander' draws each section as a collapsed expander with a toggle that loads its widgets, as Streamlit doesn't 
+    ##     report whether an expander is open. 'page' draws only the section picked in a selectbox. 
+    ## sectionDepth: the depth of the dicts that become sections, e.g. 1 for the top-level dicts
+    ## state: a dict-like store that persists across reruns e.g. st.session_state
+    ## digest: the hash of the file, so the values kept in state are reset when the file changes
+    def replayLazy(plan, rows, stObject, mode, sectionDepth, state, digest=None):
+
+        # A new file starts from its own defaults, not the values of the last one
+        if state.get('Y2S values digest') != digest or state.get('Y2S values') is None:
+            state['Y2S values'] = {}
+            state['Y2S rendered'] = set()
+            state['Y2S values digest'] = digest
+        store = state['Y2S values']
+        rendered = state.get('Y2S rendered', set())
+        nowRendered = set()
+
+        sections = YAML2ST.planSections(plan, sectionDepth)
+        page = None
+        if mode == 'page':
+            titles = [" > ".join(sectionPath) for sectionPath, steps in sections if sectionPath is not None]
+            if titles:
+                page = stObject.selectbox('Section', titles, key='Y2S page')
+
+        for sectionPath, steps in sections:
+
+            # Keys above the sections are always drawn
+            if sectionPath is None:
+                start = len(rows)
+                YAML2ST.replayPlan(steps, rows, stObject)
+                store.update(zip(rows.breadcrumbs[start:], rows.values[start:]))
+                continue
+
+            name = " > ".join(sectionPath)
+            target = stObject
+            if mode == 'page':
+                opened = name == page
+            else:
+                target = stObject.expander(name, expanded=False)
+                toggle = getattr(target, 'toggle', target.checkbox)
+                opened = toggle('Load parameters', key='Y2S open > ' + name)
+
+            if opened:
+                # A reopened section's widgets start from their last values
+                if name not in rendered:
+                    steps = [YAML2ST.__withValue(step, store[step.breadcrumb]) if step.breadcrumb in store else step for step in steps]
+                start = len(rows)
+                YAML2ST.replayPlan(steps, rows, target)
+                store.update(zip(rows.breadcrumbs[start:], rows.values[start:]))
+                nowRendered.add(name)
+            else:
+                for step in steps:
+                    if step.kind == 'hide' or (step.kind == 'widget' and not step.error):
+                        rows.append(step.key, store[step.breadcrumb] if step.breadcrumb in store else YAML2ST.stepDefault(step), step.breadcrumb)
+
+        state['Y2S rendered'] = nowRendered
+        return rows
+
+
+    # Helper
+    # Writes the rows of a section that was drawn again into the view build() returned, by their breadcrumbs' positions
+    def __patchView(live, section):
+        view = live.view
+        for key, value, breadcrumb in zip(section.keys, section.values, section.breadcrumbs):
+            position = live.positions.get(breadcrumb)
+            if position is None:
+                continue
+            if isinstance(view, list):
+                view[position] = (key, value, breadcrumb)
+            else:
+                view.iat[position, 1] = value
+
+
+    # Helper
+    # The function a fragment of replayFragments() runs to draw a section. The first run adds its rows to the build;
+    # a rerun of only this section patches its values into the view of the build.
+    def __sectionFragment(steps, rows, body, live):
+        def drawSection():
+            section = YAML2ST.replayPlan(steps, BuildRows(), body)
+            if live.view is None:
+                for key, value, breadcrumb in zip(section.keys, section.values, section.breadcrumbs):
+                    live.positions[breadcrumb] = len(rows)
+                    rows.append(key, value, breadcrumb)
+            else:
+                YAML2ST.__patchView(live, section)
+        return drawSection
+
+
+    # Draws a compiled build plan with each section as a fragment, so a change to a widget reruns only the section it's in.
+    ## Steps above sectionDepth are drawn as usual. A rerun of a section patches its values into live.view, the DataFrame 
+    ##     or records build() returned, so its cost is the size of the section.
+    ## fragment: the decorator that makes a function rerun on its own e.g. st.fragment
+    ## body: what a fragment draws to, e.g. the streamlit module, which draws within the fragment's container
+    ## live: a SimpleNamespace(view=None, positions={}) whose view is set to what build() returns
+    def replayFragments(plan, rows, stObject, sectionDepth, fragment, body, live):
+
+        for sectionPath, steps in YAML2ST.planSections(plan, sectionDepth):
+
+            # Keys above the sections rerun with the whole script
+            if sectionPath is None:
+                YAML2ST.replayPlan(steps, rows, stObject)
+                continue
+
+            # Each section is in its own container, which also tells its fragment apart from the others
+            with stObject.container():
+                fragment(YAML2ST.__sectionFragment(steps, rows, body, live))()
+
+        return rows
+
+
+    # Helper
+    # Compiles a key value pair to its step of the build plan by its #FORCE params, or else dynamically by its value
+    def __leafStep(literalParam, key, value, breadcrumb, keyPath):
+
+        # YAML2ST param: If we are hiding the param
+        if 'hide' in literalParam:
+            return PlanStep('hide', key, breadcrumb, 0, None, key, value, None, 0, (), "", None, "", keyPath)
+
+        # YAML2ST param: If an input widget w is specified via #FORCE: 
+        elif 'w' in literalParam: 
+            return YAML2ST.__paramLogic(literalParam, key, value, breadcrumb, keyPath)
             
-            df.loc[len(df)+1] = key, value, breadcrumb
-    
+        # Dynamics: Deduce streamlit input widget by its value. Chronological integrity is necessary.  
+        else: 
 
-    # Recursively, manually, and/or dynamically builds a YAML or JSON file's params to streamlit input widgets.
-    ## dict: a dictionary of the data, less comments
-    ## df: a pandas dataframe for where the streamlit input widget value updates are sent
+            kind = YAML2ST.classify(value)
+            native = value # PyYAML's int, float, and datetime are used as is rather than parsed again from their text
+            value = str(value) # Housekeeping
+            
+            # Boolean
+            if kind == 'bool':
+                literalParam['w'] = 'checkbox'
+                #literalParam['type'] = "bool"
+
+            # Integer
+            elif kind == 'int':
+                literalParam['w'] = 'number_input'
+                literalParam['type'] = "int"
+                literalParam['value'] = native if type(native) is int else int(float(value)) if 'e' in value.lower() else int(value)
+                
+            # Decimal
+            elif kind == 'decimal':
+                decFormat, decStep = YAML2ST.__calcPrecision(value)
+                literalParam['w'] = 'number_input'
+                literalParam['type'] = "float"
+                literalParam['value'] = native if type(native) is float else float(value)
+                if "format" not in literalParam:
+                    literalParam['format'] = '"' + str(decFormat) + '"'
+                if "step" not in literalParam:
+                    literalParam['step'] = decStep
+
+            # Datetime
+            elif kind == 'datetime':
+                date = YAML2ST.toDatetime(native)
+                if date.strftime("%H:%M:%S") == '00:00:00': # Date only
+                    literalParam['w'] = 'date_input'
+                    literalParam['value'] = date
+                else: 
+                    literalParam['w'] = 'datetime_input' # A custom input widget for date and time together
+                    literalParam['value'] = date
+            
+            # Hex
+            elif kind == 'hex':
+                literalParam['w'] = 'color_picker' 
+
+            # Text with new lines
+            elif kind == 'text_area':
+                literalParam['w'] = 'text_area' 
+
+            # Text with commas 
+            elif kind == 'list':
+                literalParam['w'] = 'multiselect' 
+                literalParam['options'] = value
+                literalParam['default'] = value
+            
+            # Text 
+            else: 
+                literalParam['w'] = 'text_input' 
+                literalParam['value'] = value
+
+            return YAML2ST.__paramLogic(literalParam, key, value, breadcrumb, keyPath)
+
+
+    # Recursively, manually, and/or dynamically compiles a YAML or JSON file's params to the steps of a build plan.
+    ## dataDict: a dictionary of the data, less comments
+    ## plan: a list to append the steps to. Typically start with a blank []
     ## breadcrumbs: used to track the hierarchy. Typically start with a blank []
-    ## stObject: a streamlit object on where to write the input widgets to
-    ## data_string: a string of all the data in the YAML file for #FORCE. To ignore, use ""
-    def recursiveBuild(dataDict, df, breadcrumbs, stObject, dataString):
+    ## forces: the #FORCE params of the keys from forceIndex(). To ignore, use {}
+    ## paths: the PathIndex the breadcrumbs and paths of the steps are interned in
+    def compilePlan(dataDict, plan, breadcrumbs, forces, paths=None):
 
+        paths = PathIndex() if paths is None else paths
+        parent = paths.add(tuple(str(crumb) for crumb in breadcrumbs))
         for key, value in dataDict.items():
             
-            # Get the force values to see if the nearby lines have any '#FORCE's
-            dataString, forceVal = YAML2ST.__forceConfig(dataString) 
+            # Get the force values of the key's '#FORCE'
+            node = paths.child(parent, str(key))
+            keyPath = paths.paths[node]
+            literalParam = dict(forces.get(keyPath, {}))
 
             # Check to see if is a dictionary within this dataDict
-            if str(value)[0] == '{':
+            if isinstance(value, dict):
                 breadcrumbs.append(key)
 
-                if forceVal.find('hide') == -1:
+                if 'hide' not in literalParam:
                     
                     # Deduce the proper header style for output
-                    if len(breadcrumbs)<2 :
-                        stObject.markdown('<p class="h1">' + key + '</p>', unsafe_allow_html=True)
-                    elif len(breadcrumbs)==2:
-                        stObject.markdown('<p class="h2">' + key + '</p>', unsafe_allow_html=True)
-                    elif len(breadcrumbs)==3:
-                        stObject.markdown('<p class="h3">' + key + '</p>', unsafe_allow_html=True)
-                    else:
-                        stObject.markdown('<p class="h4">' + key + '</p>', unsafe_allow_html=True)
+                    plan.append(PlanStep('header', key, paths.breadcrumbs[node], min(len(breadcrumbs), 4), None, key, None, None, 0, (), "", None, "", keyPath))
                 
                 # Repeat process within next dict
-                dataString = YAML2ST.recursiveBuild(value, df, breadcrumbs, stObject, dataString)[1]
+                YAML2ST.compilePlan(value, plan, breadcrumbs, forces, paths)
                 breadcrumbs.pop(len(breadcrumbs)-1)
 
             else:  # Is a key value pair (if correct YAML)
-                
-                # Breadcrumb tracking
-                if len(breadcrumbs) == 0: breadcrumb = "".join(("".join(breadcrumbs),key))
-                else: breadcrumb = " > ".join((" > ".join(breadcrumbs),key))
-                
-                # Pre-Process params: Split the params into key value pairs so we can parse the keys 
-                literalParam = {}
-                if forceVal != "":
-                    force_arr = YAML2ST.__stripSpace(forceVal).split("|")
-                    for fitem in force_arr:
-                        if fitem != "":
-                            fkey, fvalue = fitem.split("=")
-                            literalParam[fkey] = fvalue
-
-                # YAML2ST param: If we are hiding the param
-                if 'hide' in literalParam:
-                    df.loc[len(df)+1] = key, value, breadcrumb
-
-                # YAML2ST param: If an input widget w is specified via #FORCE: 
-                elif 'w' in literalParam: 
-                    YAML2ST.__paramLogic(literalParam, key, value, breadcrumb, df, stObject)
-                    
-                # Dynamics: Deduce streamlit input widget by its value. Chronological integrity is necessary.  
-                else: 
+                plan.append(YAML2ST.__leafStep(literalParam, key, value, paths.breadcrumbs[node], keyPath))
+
+        return plan
 
-                    value = str(value) # Housekeeping
-                    
-                    # Boolean
-                    if value == 'True' or value == 'true':
-                        literalParam['w'] = 'checkbox'
-                        #literalParam['type'] = "bool"
-                    elif value == 'False' or value == 'false':
-                        literalParam['w'] = 'checkbox'
-                        #literalParam['type'] = "bool"
-
-                    # Integer
-                    elif YAML2ST.__representsInt(value):
-                        literalParam['w'] = 'number_input'
-                        literalParam['type'] = "int"
-                        literalParam['value'] = int(value)
-                        
-                    # Decimal
-                    elif YAML2ST.__representsDecimal(value):
-                        decFormat, decStep = YAML2ST.__calcPrecision(value)
-                        literalParam['w'] = 'number_input'
-                        literalParam['type'] = "float"
-                        literalParam['value'] = float(value)
-                        if "format" not in literalParam:
-                            literalParam['format'] = '"' + str(decFormat) + '"'
-                        if "step" not in literalParam:
-                            literalParam['step'] = decStep
-
-                    # Datetime
-                    elif YAML2ST.__representsDatetime(value):
-                        date = parser.isoparse(value)
-                        if date.strftime("%H:%M:%S") == '00:00:00': # Date only
-                            literalParam['w'] = 'date_input'
-                            literalParam['value'] = date
-                        else: 
-                            literalParam['w'] = 'datetime_input' # A custom input widget for date and time together
-                            literalParam['value'] = date
-                    
-                    # Hex
-                    elif YAML2ST.__representsHex(value):
-                        literalParam['w'] = 'color_picker' 
-
-                    # Text with new lines
-                    elif ('\n' in value):
-                        literalParam['w'] = 'text_area' 
-
-                    # Text with commas 
-                    elif YAML2ST.__representsList(value):
-                        literalParam['w'] = 'multiselect' 
-                        literalParam['options'] = value
-                        literalParam['default'] = value
-                    
-                    # Text 
-                    else: 
-                        literalParam['w'] = 'text_input' 
-                        literalParam['value'] = value
 
-                    YAML2ST.__paramLogic(literalParam, key, value, breadcrumb, df, stObject)
+    # Compiles the records of iterRecords() to the steps of a build plan one at a time, like compilePlan()
+    def compileRecords(records):
+        for record in records:
+            literalParam = dict(record.force)
+            if isinstance(record.value, dict):
+                if 'hide' not in literalParam:
+                    yield PlanStep('header', record.key, record.breadcrumb, min(len(record.path), 4), None, record.key, None, None, 0, (), "", None, "", record.path)
+            else:
+                yield YAML2ST.__leafStep(literalParam, record.key, record.value, record.breadcrumb, record.path)
 
-        return df, dataString
+
+    # Recursively, manually, and/or dynamically builds a YAML or JSON file's params to streamlit input widgets.
+    ## dict: a dictionary of the data, less comments
+    ## df: a pandas dataframe for where the streamlit input widget value updates are sent
+    ## breadcrumbs: used to track the hierarchy. Typically start with a blank []
+    ## stObject: a streamlit object on where to write the input widgets to
+    ## data_string: a string of all the data in the YAML file for #FORCE. To ignore, use ""
+    def recursiveBuild(dataDict, df, breadcrumbs, stObject, dataString):
+        plan = YAML2ST.compilePlan(dataDict, [], breadcrumbs, YAML2ST.forceIndex(dataString))
+        rows = YAML2ST.replayPlan(plan, BuildRows(), stObject).toDataFrame(len(df) + 1)
+        import pandas as pd
+        return (rows if df.empty else pd.concat([df, rows])), dataString
 
 
 ##  ##   ## ##     ## ##   
@@ -457,15 +2562,13 @@ class YAML2ST:
   ##     ######    ## ##   
                         
 
-# Input URL params via dict and this outputs a formatted YAML file; namely, Streamlit's UploadedFile
-def urlDecode(urlParamDict):
-    uploadedFileRec = UploadedFileRec(int(999), str("config.yaml"), str("application/x-yaml"), bytes(urlParamDict.get("YAML2URL")[0],'ascii'))
-    return UploadedFile(uploadedFileRec)
-
-
-# YAML file to Streamlit's UploadedFile
-def YAML2UploadedFile(filePath):
-    uploadedFileRec = UploadedFileRec(int(999), str("config.yaml"), str("application/x-yaml"), open(filePath, "rb").read())
+# Bytes to Streamlit's UploadedFile
+def bytesToUploadedFile(data, fileName="config.yaml"):
+    try: 
+        from streamlit.runtime.uploaded_file_manager import UploadedFile, UploadedFileRec
+    except ImportError: # Streamlit before 1.12
+        from streamlit.uploaded_file_manager import UploadedFile, UploadedFileRec # type: ignore
+    uploadedFileRec = UploadedFileRec(int(999), str(fileName), str("application/x-yaml"), data)
     try:
         # The original way
         return UploadedFile(uploadedFileRec)
@@ -475,77 +2578,427 @@ def YAML2UploadedFile(filePath):
         return UploadedFile(uploadedFileRec, '')
 
 
-# A raw export method that returns an unclosed file, the fileName, and a string URL to be shared. 
-## upload: the origional uploadedFile used to create df
+# Input URL params via dict and this outputs a formatted YAML file; namely, Streamlit's UploadedFile
+## base: the base UploadedFile, or its bytes, if the link is a delta from urlEncodeDelta()
+## The link is decoded and its file parsed once for all sessions. See YAML2ST.sharedDocument()
+## Returns None if the link can't be decoded, e.g. it was cut short, or it's a delta link without its base file
+def urlDecode(urlParamDict, base=None):
+    try:
+        document = YAML2ST.sharedDocument(urlParamDict.get("YAML2URL")[0], base)
+    except ValueError:
+        return None
+    return bytesToUploadedFile(document.data)
+
+
+# Loads a binary snapshot from exportRaw(snapshot=True) or YAML2ST.snapshotBytes() with a memory map. Returns a Snapshot
+## Pass it to build() or export() in place of the upload. Snapshot.toYAML() returns the file with its comments and values.
+def loadSnapshot(filePath):
+    import mmap
+    with open(filePath, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return YAML2ST.snapshotFromBuffer(mapped)
+
+
+# YAML file to Streamlit's UploadedFile
+def YAML2UploadedFile(filePath):
+    with open(filePath, "rb") as f:
+        return bytesToUploadedFile(f.read())
+
+
+# Loads a sidecar widget spec, compiled once per its contents. See WidgetSpec
+## source: the path of a YAML or JSON spec file, its bytes, an UploadedFile of it, a dict of {pattern: params}, or a WidgetSpec
+## Raises ValueError with all the errors of the spec
+def loadSpec(source):
+    if isinstance(source, WidgetSpec):
+        return source
+    if isinstance(source, dict):
+        return WidgetSpec(source)
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as specFile:
+            data = specFile.read()
+    else:
+        data = source if isinstance(source, bytes) else source.getvalue()
+
+    digest = hashlib.sha256(data).hexdigest()
+    spec = specCache.get(digest)
+    if spec is None:
+        import yaml
+        try:
+            rules = yaml.load(data, YAML2ST.safeLoader())
+        except yaml.YAMLError as e:
+            raise ValueError("YAML2ST: The widget spec isn't valid YAML or JSON: " + str(e))
+        if not isinstance(rules, dict):
+            raise ValueError("YAML2ST: The widget spec must be a dict of {pattern: params}.")
+        spec = WidgetSpec(rules)
+        specCache.put(digest, spec)
+    return spec
+
+
+# An in-memory export method that returns the file's bytes, the fileName, and a string URL to be shared. No file is written.
+## upload: the origional uploadedFile used to create df, or its bytes
 ## df: the changed values of the uploaded file
 ## URL: the domain to append a parameter to e.g. https://pg.com/
-## exportFilePath: the path to export the data inclusive of the file name e.g. /users/user/config.yaml. 
-def exportRaw(upload, df, URL, exportFilePath):
-
-    upload = copy.deepcopy(upload)
+## incremental: if True, only the changed values are patched into the uploaded file's text. See YAML2ST.patchExport()
+def exportBytes(upload, df, URL, incremental=False):
 
     # Get the file details
-    file_details = {"Filename":upload.name,"FileType":upload.type,"FileSize":upload.size}
-    fname = file_details['Filename'].split(".", 1)[0] + ".yaml"
+    fname = ("config" if isinstance(upload, bytes) else upload.name.split(".", 1)[0]) + ".yaml"
 
-    newFile = open(exportFilePath, "w")
-    line_to_comment = YAML2ST.prepComments(upload)
-    YAML2ST.recursiveExport(df, [""], newFile, line_to_comment, YAML2ST.lineCheck(line_to_comment, 0, newFile))
-    newFile.close()
+    with stage('export'):
+        if incremental:
+            data = YAML2ST.patchExport(upload, df).encode("utf-8")
+        else:
+            newFile = io.StringIO()
+            source = upload if isinstance(upload, bytes) else upload.getvalue()
+            YAML2ST.writeExport(df, newFile, YAML2ST.commentIndex(source), YAML2ST.pathIndex(source))
+            data = newFile.getvalue().encode("utf-8")
+        link = str(URL + "?YAML2URL=" + YAML2ST.urlEncode(data))
 
-    return str(URL + "?YAML2URL=" + YAML2ST.urlEncode(YAML2UploadedFile(exportFilePath)))
+    return data, fname, link
+
+
+# A raw export method that writes the file to exportFilePath and returns a string URL to be shared. 
+## upload: the origional uploadedFile used to create df
+## df: the changed values of the uploaded file
+## URL: the domain to append a parameter to e.g. https://pg.com/
+## exportFilePath: the path to export the data inclusive of the file name e.g. /users/user/config.yaml. 
+## snapshot: if True, writes a binary snapshot of the file and df instead of YAML, to be loaded by loadSnapshot(). 
+##     Its link is of only the changed values patched into the file, so the whole file isn't exported for the link alone.
+def exportRaw(upload, df, URL, exportFilePath, incremental=False, snapshot=False):
+
+    if snapshot:
+        data = YAML2ST.snapshotBytes(upload, df)
+        link = exportBytes(upload, df, URL, incremental=True)[2]
+    else:
+        data, fname, link = exportBytes(upload, df, URL, incremental)
+    with open(exportFilePath, "wb") as newFile:
+        newFile.write(data)
+
+    return link
 
 
 # Is a pre-formatted export method that posts a Button Input Widget and Code Input Widget for
-# file download and link sharing. 
-def export(upload, df, stObject, URL):
+# file download and link sharing. The file is built in memory and never touches the disk. 
+def export(upload, df, stObject, URL, incremental=False):
 
-    upload = copy.deepcopy(upload)
+    # Create the file's contents
+    data, fname, link = exportBytes(upload, df, URL, incremental)
+    exportWidgets(stObject, data, fname, link)
 
-    # Get the file details
-    file_details = {"Filename":upload.name,"FileType":upload.type,"FileSize":upload.size}
 
-    # Create a downloaded file with the contents
-    fname = file_details['Filename'].split(".", 1)[0] + "_new.yaml"
-    newFile = open(fname, "w")
-    line_to_comment = YAML2ST.prepComments(upload)
-    YAML2ST.recursiveExport(df, [""], newFile, line_to_comment, YAML2ST.lineCheck(line_to_comment, 0, newFile))
-    newFile.close()
+# Draws the download button and share link of an export to the stObject
+def exportWidgets(stObject, data, fname, link):
+    fname = fname.split(".", 1)[0] + "_new.yaml"
 
     # Display the button for download
     stObject.subheader("Export YAML File")
-    with open(fname, "r") as f:
-        stObject.download_button('Download', f, file_name=fname)
+    stObject.download_button('Download', data, file_name=fname)
 
     stObject.subheader("Share With Link")
-    stObject.code(URL + "?YAML2URL=" + YAML2ST.urlEncode(YAML2UploadedFile(fname)))
+    stObject.code(link)
+
+
+# The thread pool that exportFuture() exports in, started on first use
+def exportExecutor():
+    global exportPool
+    with exportPoolLock:
+        if exportPool is None:
+            from concurrent.futures import ThreadPoolExecutor
+            exportPool = ThreadPoolExecutor(max_workers=EXPORTWORKERS, thread_name_prefix='YAML2ST export')
+        return exportPool
+
+
+# Starts an export off the script thread. Returns a concurrent.futures.Future of exportBytes()'s (data, fileName, sharelink)
+## The rows of df are copied when it's called, so df may change while the export runs.
+## An export of the same file, rows, and options returns the same Future from exportCache, so repeats don't export again.
+## executor: a concurrent.futures executor e.g. a ProcessPoolExecutor. Defaults to a thread pool shared by all sessions
+def exportFuture(upload, df, URL, incremental=False, executor=None):
+
+    data = upload if isinstance(upload, bytes) else upload.getvalue()
+    fileName = "config.yaml" if isinstance(upload, bytes) else upload.name
+    digest, rows = YAML2ST.exportDigest(data, df, fileName, URL, incremental)
+
+    future = exportCache.get(digest)
+    if future is not None and not future.cancelled() and not (future.done() and future.exception() is not None):
+        return future
+
+    future = (executor or exportExecutor()).submit(YAML2ST.exportTask, data, fileName, rows, URL, incremental)
+    exportCache.put(digest, future)
+    return future
+
+
+# Draws the export of an exportFuture() to the stObject once it's done, and a message until then, without blocking the script.
+## Keep the future e.g. in st.session_state and call this each run. While the export runs, a fragment checks it every pollEvery
+## seconds and reruns the script when it's done. Streamlit versions without fragments wait for the export.
+def drawExport(future, stObject, pollEvery=0.5):
+
+    import streamlit
+    fragment = getattr(streamlit, 'fragment', None) or getattr(streamlit, 'experimental_fragment', None)
+    if not future.done() and fragment is not None:
+        def poll():
+            if future.done():
+                streamlit.rerun()
+            streamlit.info("Exporting...")
+        with stObject.container():
+            fragment(poll, run_every=pollEvery)()
+        return
+
+    try:
+        data, fname, link = future.result()
+    except Exception as e:
+        stObject.error("YAML2ST: Couldn't export the file: " + str(e))
+        return
+    exportWidgets(stObject, data, fname, link)
+
+
+# A batch export method that renders many variants of one template file in memory. Returns a list of (data, fileName, link).
+## The template is parsed and its comments are indexed once. The variants are rendered across a pool of processes.
+## upload: the template UploadedFile, or its bytes
+## variants: a list of variants, or a dict of {name: variant} to name the files. A variant is a dict of {breadcrumb: value}, 
+##     or a DataFrame, BuildRows, or the records of build(), with the values that differ from the template
+## URL: the domain to append a parameter to e.g. https://pg.com/
+## processes: the number of processes of the pool. Defaults to the number of CPUs. Use 1 to render in this process.
+def exportBatchBytes(upload, variants, URL, processes=None):
+
+    data = upload if isinstance(upload, bytes) else upload.getvalue()
+    stem = upload.name.split(".", 1)[0] if hasattr(upload, 'name') else "config"
+    if isinstance(variants, dict):
+        names, variants = [str(name) for name in variants], list(variants.values())
+    else:
+        variants = list(variants)
+        names = [stem + "_" + str(index + 1) for index in range(len(variants))]
+
+    with stage('export'):
+
+        # Parse the template and index its comments once for every variant
+        original, spans, paths = YAML2ST.sourceIndex(data)
+        line_to_comment = YAML2ST.commentIndex(data)
+        variantRows = [YAML2ST.variantRows(original, variant, paths) for variant in variants]
+
+        if processes == 1 or len(variantRows) < 2:
+            results = [YAML2ST.renderVariant(rows, URL, line_to_comment, paths) for rows in variantRows]
+        else:
+            from concurrent.futures import ProcessPoolExecutor
+            workers = processes or os.cpu_count() or 1
+            with ProcessPoolExecutor(max_workers=workers, initializer=YAML2ST.setBatchComments, initargs=(line_to_comment, paths)) as pool:
+                results = list(pool.map(functools.partial(YAML2ST.renderVariant, URL=URL), variantRows, chunksize=max(1, len(variantRows) // (workers * 4))))
+
+    return [(fileData, name + ".yaml", link) for name, (fileData, link) in zip(names, results)]
+
+
+# A batch export method that writes the file of each variant to exportDir. Returns the list of their share links.
+## exportDir: the directory to write the files to e.g. /users/user/variants. See exportBatchBytes() for the other params
+def exportBatchRaw(upload, variants, URL, exportDir, processes=None):
+
+    links = []
+    for data, fname, link in exportBatchBytes(upload, variants, URL, processes):
+        with open(os.path.join(exportDir, fname), "wb") as newFile:
+            newFile.write(data)
+        links.append(link)
+
+    return links
+
+
+# A batch export method that zips the files of the variants in memory. Returns the zip's bytes, its fileName, and the share links.
+## See exportBatchBytes() for the params
+def exportBatchZip(upload, variants, URL, processes=None):
+
+    import zipfile
+    buffer = io.BytesIO()
+    links = []
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for data, fname, link in exportBatchBytes(upload, variants, URL, processes):
+            archive.writestr(fname, data)
+            links.append(link)
+    stem = upload.name.split(".", 1)[0] if hasattr(upload, 'name') else "config"
 
-    os.remove(fname)
+    return buffer.getvalue(), stem + "_variants.zip", links
+
+
+# Is a pre-formatted batch export method that posts a single Button Input Widget for the zip of all the variants'
+# files and a Code Input Widget with their share links. See exportBatchBytes() for the params
+def exportBatch(upload, variants, stObject, URL, processes=None):
+
+    data, fname, links = exportBatchZip(upload, variants, URL, processes)
+
+    stObject.subheader("Export YAML Files")
+    stObject.download_button('Download All', data, file_name=fname, mime="application/zip")
+
+    stObject.subheader("Share With Links")
+    stObject.code("\n".join(links))
+
+
+# Compiles an upload file to a build plan once and caches it by the hash of its contents. 
+## upload: an UploadedFile, or the bytes of a file
+## Returns None if the upload is not a valid YAML or JSON file, or {} if it has no data, after drawing the error to the stObject.
+def uploadToPlan(upload, stObject, spec=None):
+
+    data = upload if isinstance(upload, bytes) else upload.getvalue()
+    digest = hashlib.sha256(data).hexdigest()
+    if spec is not None:
+        try:
+            spec = loadSpec(spec)
+        except ValueError as e:
+            stObject.error(str(e))
+            return None
+    planKey = digest if spec is None else digest + spec.digest # The plan of the file with this spec
+    plan = planCache.get(planKey)
+    if plan is not None:
+        return plan
+
+    # Generate string of file for possible comments
+    data_string = data.decode("utf-8")
+
+    # Generate dataDict of file and its #FORCE params from a single parse
+    with stage('parse'):
+        try: # YAML
+            dataDict, node = YAML2ST.composeDocument(data_string)
+        except: # Maybe it's JSON
+            try:
+                dataDict = dict(json.loads(data_string))
+                node = None
+            except:
+                stObject.error("Read Error: Not a valid YAML or JSON file.")
+                return None
+
+    if not bool(dataDict):
+        stObject.error("Build Error: Could be due to bad share link and/or wrong YAML formatting. Remove share link if present.")
+        return {}
+
+    paths = PathIndex() # The plan and an export of the file share the interned breadcrumbs
+    if node is not None: # So an incremental export of this file doesn't parse it again
+        sourceCache.put(digest, (YAML2ST.flattenData(dataDict, paths), YAML2ST.valueSpans(data_string, node), paths))
+    elif spec is not None:
+        YAML2ST.flattenData(dataDict, paths)
+
+    # Every bad #FORCE directive is reported at once, before any widget is drawn
+    errors = []
+    with stage('force'):
+        forces = YAML2ST.forceIndex(data_string, node, errors) if node is not None else {}
+        if spec is not None:
+            forces = spec.forces(paths, forces)
+    if errors:
+        stObject.error("YAML2ST: Bad #FORCE params:\n\n" + "\n\n".join(errors))
+        return None
+    with stage('classify'):
+        plan = tuple(YAML2ST.compilePlan(dataDict, [], [], forces, paths))
+    if paths.ambiguous: # Their widgets, rows, and exports would be mixed up
+        stObject.error(PathIndex.ambiguityError(paths.ambiguous))
+        return None
+    planCache.put(planKey, plan)
+    return plan
+
+
+# Compiles an upload file to the steps of a build plan as the file is read, for files too big to load whole. Isn't cached.
+## upload: an UploadedFile, an open binary file, or the bytes of a file
+## If the file stops being valid YAML, draws the error to the stObject after the steps before it.
+def streamPlan(upload, stObject):
+    import yaml
+    source = io.BytesIO(upload) if isinstance(upload, bytes) else upload
+    source.seek(0)
+    try:
+        yield from YAML2ST.compileRecords(YAML2ST.iterRecords(source))
+    except yaml.YAMLError as e:
+        stObject.error("Read Error: Not a valid YAML or JSON file. \n\n" + str(e))
 
 
 # Uses an upload file and builds the input parameters to the steamlit object 
-def build(upload, stObject):
+## The build plan is compiled once per upload's contents. Reruns only replay the widgets.
+## stObject: a streamlit object on where to write the input widgets to, or a HeadlessRenderer to build without drawing
+## records: if True, returns the rows as a list of (key, st_value, breadcrumb) tuples instead of a pandas DataFrame
+## lazy: None draws every widget. 'expander' or 'page' draws the dicts at sectionDepth as sections and builds widgets only 
+##     for the sections the user opens. See YAML2ST.replayLazy()
+## sectionDepth: the depth of the dicts drawn as sections, e.g. 1 for the top-level dicts
+## state: where lazy sections keep their values across reruns. Defaults to st.session_state
+## stream: if True, reads the file a key at a time and draws each widget as it is read, for files too big to load whole. 
+##     The plan isn't cached, so each rerun reads the file again. See YAML2ST.iterRecords()
+## fragments: if True, draws the dicts at sectionDepth as st.fragment sections, so changing a widget reruns only its section
+##     and patches the returned DataFrame or records in place. Ignored with lazy. See YAML2ST.replayFragments()
+## store: if True, returns the file's ValueStore, kept in state under 'Y2S store' and updated by the widgets' on_change 
+##     callbacks, instead of the rows. Its DataFrame is made only when asked, by store.toDataFrame(). Ignores records, lazy, 
+##     fragments and stream. 
+## spec: a sidecar widget spec of params for the keys matching breadcrumb patterns, e.g. the path of its file. See loadSpec(). 
+##     Compiled once and cached with the file's plan. Not used with stream.
+## typed: if True, the DataFrame's keys are categorical and its 'dtype' column tags the native type of each value. See BuildRows.toDataFrame()
+def build(upload, stObject, records=False, lazy=None, sectionDepth=1, state=None, stream=False, fragments=False, store=False, spec=None, typed=False):
 
     # Configure appearance
     YAML2ST.configHeaderFormat(stObject)
 
-    # Generate string of file for possible comments
-    data_string = YAML2ST.uploadToDataString(copy.deepcopy(upload))
+    if store:
+        return buildStore(upload, stObject, state, spec)
 
-    # Generate dataDict of file 
-    try: # YAML
-        dataDict = dict(yaml.load(copy.deepcopy(upload), yaml.SafeLoader))
-    except: # Maybe it's JSON
-        try:
-            dataDict = dict(json.load(copy.deepcopy(upload)))
-        except:
-            stObject.error("Read Error: Not a valid YAML or JSON file.")
-            return pd.DataFrame()
+    if isinstance(upload, Snapshot):
+        plan = YAML2ST.snapshotPlan(upload)
+    else:
+        plan = streamPlan(upload, stObject) if stream else uploadToPlan(upload, stObject, spec)
+    if plan is None:
+        if records:
+            return []
+        import pandas as pd
+        return pd.DataFrame()
 
-    if bool(dataDict):
+    if bool(plan):
 
         # Build parameters to streamlit
-        return YAML2ST.recursiveBuild(dataDict, pd.DataFrame(columns=['key','st_value','breadcrumb']), [], stObject, data_string)[0]                
-
-    else: 
-        stObject.error("Build Error: Could be due to bad share link and/or wrong YAML formatting. Remove share link if present.")
\ No newline at end of file
+        with stage('render'):
+            if isinstance(stObject, HeadlessRenderer):
+                rows = stObject.render(plan, BuildRows())
+            elif lazy in LAZYMODES:
+                if state is None:
+                    import streamlit
+                    state = streamlit.session_state
+                if isinstance(upload, Snapshot):
+                    digest = hashlib.sha256(upload.source).hexdigest()
+                else:
+                    data = upload if isinstance(upload, bytes) else upload.getvalue()
+                    digest = hashlib.sha256(data).hexdigest() + (loadSpec(spec).digest if spec is not None and not stream else "")
+                rows = YAML2ST.replayLazy(plan, BuildRows(), stObject, lazy, sectionDepth, state, digest)
+            elif fragments:
+                import streamlit
+                fragment = getattr(streamlit, 'fragment', None) or getattr(streamlit, 'experimental_fragment', None)
+                if fragment is None: # Streamlit before fragments reruns the whole script
+                    rows = YAML2ST.replayPlan(plan, BuildRows(), stObject)
+                else:
+                    live = SimpleNamespace(view=None, positions={})
+                    rows = YAML2ST.replayFragments(plan, BuildRows(), stObject, sectionDepth, fragment, streamlit, live)
+                    live.view = rows.records() if records else rows.toDataFrame(typed=typed)
+                    return live.view
+            else:
+                rows = YAML2ST.replayPlan(plan, BuildRows(), stObject)
+        return rows.records() if records else rows.toDataFrame(typed=typed)
+
+
+# Draws an upload file's widgets with their values kept in its ValueStore in state. See build(store=True)
+## Returns the ValueStore, or None if the file can't be built
+def buildStore(upload, stObject, state=None, spec=None):
+
+    if state is None:
+        import streamlit
+        state = streamlit.session_state
+
+    data = upload if isinstance(upload, bytes) else upload.getvalue()
+    plan = uploadToPlan(data, stObject, spec)
+    if not plan:
+        return None
+
+    # A new file or spec starts a new store
+    digest = hashlib.sha256(data).hexdigest() + (loadSpec(spec).digest if spec is not None else "")
+    store = state.get('Y2S store')
+    if store is None or store.digest != digest:
+        store = state['Y2S store'] = ValueStore(digest, plan)
+
+    with stage('render'):
+        return YAML2ST.replayStore(plan, store, stObject, state)
+
+
+# Builds an upload file without Streamlit, e.g. to precompute and validate configs in batch jobs or API workers
+## upload: an UploadedFile, or the bytes of a file
+## Returns the rows of the widgets' default values, as build() does, and the widget manifest: {breadcrumb: manifestEntry()}
+## Raises ValueError if the file can't be built
+def buildHeadless(upload, records=True, spec=None):
+    renderer = HeadlessRenderer()
+    rows = build(upload, renderer, records, spec=spec)
+    if renderer.errors:
+        raise ValueError(renderer.errors[0])
+    return rows, renderer.manifest
@@ -0,0 +1,224 @@
+# Benchmarks the hot paths of YAML2ST on synthetic configs. No Streamlit server is needed.
+## Run: python app_test/bench.py
+## Save a baseline: python app_test/bench.py --save app_test/bench_baseline.json
+## Check against it: python app_test/bench.py --baseline app_test/bench_baseline.json --threshold 0.25
+## Exits with 1 if a stage of a config got slower or used more memory than the baseline by more than the threshold.
+
+import io
+import os
+import sys
+import json
+import time
+import random
+import datetime
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app", "src"))
+import YAML2ST as y2s
+
+
+SIZES = (100, 1000, 10000, 100000)
+SHAPES = { # name: (breadth, depth, commentDensity)
+    'wide': (50, 1, 0.0),
+    'deep': (4, 6, 0.0),
+    'commented': (10, 2, 0.5),
+}
+VALUES = (
+    '"text {0}"',
+    '{0}',
+    '-0.{0}5',
+    'true',
+    '2015-06-17 14:03:40',
+    '"#0EE2D7"',
+    '[ "one", "two", "three", "{0}" ]',
+    '"two" #FORCE: w=selectbox | options=[ "one", "two", "three" ]',
+)
+TIMEFLOOR = 0.002 # Seconds. Smaller changes of time are noise and are never a regression.
+
+
+# A stand-in for a Streamlit object that records the widget calls instead of drawing them
+## Widgets return their default value like Streamlit does before the user changes them.
+class StubStreamlit:
+
+    def __init__(self):
+        self.calls = []
+
+    def columns(self, spec):
+        self.calls.append(('columns', spec))
+        return [self for _ in range(spec if isinstance(spec, int) else len(spec))]
+
+    def __getattr__(self, name):
+        def widget(*args, **kwargs):
+            self.calls.append((name, kwargs.get('key')))
+            if 'value' in kwargs:
+                value = kwargs['value']
+                if name == 'date_input' and isinstance(value, datetime.datetime):
+                    return value.date()
+                if name == 'time_input' and isinstance(value, datetime.datetime):
+                    return value.time()
+                return value
+            if 'options' in kwargs:
+                if name == 'multiselect':
+                    return kwargs.get('default', [])
+                return kwargs['options'][kwargs.get('index', 0)] if kwargs['options'] else None
+            return None
+        return widget
+
+
+# Generates the text of a YAML config with keys leaf values nested depth dicts deep, breadth per dict
+## commentDensity: the chance of a line getting a comment, on its own line or trailing the value
+def genConfig(keys, breadth, depth, commentDensity, seed=0):
+    rng = random.Random(seed)
+    lines = ['---']
+    last = ()
+    for i in range(keys):
+        path = (i // breadth ** depth,) + tuple((i // breadth ** level) % breadth for level in range(depth - 1, 0, -1))
+        diverged = False
+        for index, section in enumerate(path):
+            if diverged or index >= len(last) or last[index] != section:
+                diverged = True
+                lines.append('  ' * index + 'section' + str(section) + ':')
+        last = path
+
+        indent = '  ' * len(path)
+        if rng.random() < commentDensity:
+            lines.append(indent + '# A comment about key' + str(i))
+        line = indent + 'key' + str(i) + ': ' + VALUES[i % len(VALUES)].format(i)
+        if rng.random() < commentDensity and '#' not in line:
+            line += ' # A trailing comment'
+        lines.append(line)
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+# Times fn as the best of repeat runs, then runs it once more traced for its peak memory and the blocks it allocated
+## blocks: the memory blocks the run allocated and kept, e.g. in caches, summed from the diffs of each traceback's blocks 
+##     against a snapshot taken before the run. What fn returns is dropped first, so it isn't counted.
+def measure(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        result = fn()
+        current, peak = tracemalloc.get_traced_memory()
+        del result
+        after = tracemalloc.take_snapshot()
+        blocks = sum(stat.count_diff for stat in after.compare_to(before, 'traceback') if stat.count_diff > 0)
+    finally:
+        tracemalloc.stop()
+    return {'time': best, 'peak': peak, 'blocks': blocks}
+
+
+# The stages of YAML2ST to measure for one config. Returns [(stage, fn)]
+def stages(data, exportPath):
+    upload = y2s.bytesToUploadedFile(data)
+    df = y2s.build(upload, StubStreamlit())
+    link = y2s.YAML2ST.urlEncode(data)
+
+    def coldBuild():
+        y2s.planCache.clear()
+        return y2s.build(upload, StubStreamlit())
+
+    # The file's comments and parsed original, as the first export of a file finds them
+    def coldExport():
+        y2s.commentCache.clear()
+        y2s.sourceCache.clear()
+        return y2s.exportRaw(upload, df, "http://localhost:9097/", exportPath)
+
+    # The first session to open a link decodes it and compiles its file
+    def coldDecode():
+        y2s.linkCache.clear()
+        y2s.planCache.clear()
+        y2s.commentCache.clear()
+        return y2s.urlDecode({'YAML2URL': [link]})
+
+    return [
+        ('build', coldBuild),
+        ('rebuild', lambda: y2s.build(upload, StubStreamlit())),
+        ('prepComments', lambda: y2s.YAML2ST.prepComments(io.BytesIO(data))),
+        ('exportRaw', coldExport),
+        ('patchExport', lambda: y2s.YAML2ST.patchExport(upload, df)),
+        ('urlEncode', lambda: y2s.YAML2ST.urlEncode(data)),
+        ('urlDecode', coldDecode),
+    ]
+
+
+# Runs every stage for every config. Returns {config: {stage: {'time', 'peak', 'blocks'}}}
+def run(sizes, shapes, repeat):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        exportPath = os.path.join(tmp, 'export.yaml')
+        for shape in shapes:
+            breadth, depth, commentDensity = SHAPES[shape]
+            for size in sizes:
+                config = shape + '-' + str(size)
+                data = genConfig(size, breadth, depth, commentDensity)
+                results[config] = {}
+                for stage, fn in stages(data, exportPath):
+                    results[config][stage] = measure(fn, repeat)
+                    print(config, stage, file=sys.stderr, flush=True) # Progress
+    return results
+
+
+# Compares the results with a baseline. Returns the regressions as text lines.
+def regressions(results, baseline, threshold):
+    lines = []
+    for config, configStages in results.items():
+        for stage, metrics in configStages.items():
+            base = baseline.get(config, {}).get(stage)
+            if base is None:
+                continue
+            for metric, value in metrics.items():
+                limit = base[metric] * (1 + threshold)
+                if metric == 'time':
+                    limit = max(limit, base[metric] + TIMEFLOOR)
+                if value > limit:
+                    lines.append(config + ' ' + stage + ' ' + metric + ': ' + format(value, '.6g') + ' > ' + format(base[metric], '.6g') + ' baseline')
+    return lines
+
+
+def printTable(results):
+    print(format('config', '<18') + format('stage', '<14') + format('time (ms)', '>12') + format('peak (KiB)', '>14') + format('blocks', '>10'))
+    for config, configStages in results.items():
+        for stage, metrics in configStages.items():
+            print(format(config, '<18') + format(stage, '<14') + format(metrics['time'] * 1000, '>12.2f') + format(metrics['peak'] / 1024, '>14.1f') + format(metrics['blocks'], '>10'))
+
+
+def main():
+    argParser = argparse.ArgumentParser(description="Benchmarks build, export, and share links of YAML2ST on synthetic configs.")
+    argParser.add_argument('--sizes', default=",".join(str(size) for size in SIZES), help="comma separated numbers of keys")
+    argParser.add_argument('--shapes', default=",".join(SHAPES), help="comma separated shapes of: " + ", ".join(SHAPES))
+    argParser.add_argument('--repeat', type=int, default=3, help="runs per stage; the best time is kept")
+    argParser.add_argument('--save', help="write the results to this baseline file")
+    argParser.add_argument('--baseline', help="fail if a stage regresses against this baseline file")
+    argParser.add_argument('--threshold', type=float, default=0.25, help="the allowed regression, e.g. 0.25 for 25%%")
+    args = argParser.parse_args()
+
+    results = run([int(size) for size in args.sizes.split(",")], args.shapes.split(","), args.repeat)
+    printTable(results)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        lines = regressions(results, baseline, args.threshold)
+        if lines:
+            print("\nRegressions over " + format(args.threshold, '.0%') + ":")
+            print("\n".join(lines))
+            sys.exit(1)
+        print("\nNo regressions over " + format(args.threshold, '.0%') + ".")
+
+
+if __name__ == '__main__':
+    main()
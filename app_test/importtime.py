@@ -0,0 +1,50 @@
+# Checks that "import YAML2ST" alone stays fast, as measured by python -X importtime
+## Run: python app_test/importtime.py --budget 30
+## Exits with 1 if the import takes longer than the budget or loads a heavy dependency, which must only load on first use.
+
+import os
+import sys
+import argparse
+import subprocess
+
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app", "src")
+HEAVY = ('pandas', 'numpy', 'streamlit', 'dateutil', 'yaml', 'inspect')
+
+
+# Imports YAML2ST in a fresh interpreter. Returns its cumulative import time in ms and the heavy modules it loaded.
+def importOnce():
+    code = "import YAML2ST, sys; print(','.join(m for m in " + repr(HEAVY) + " if m in sys.modules))"
+    env = dict(os.environ, PYTHONPATH=SRC + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], env=env, capture_output=True, text=True, check=True)
+    for line in result.stderr.splitlines():
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].strip() == 'YAML2ST':
+            return int(fields[1]) / 1000, [name for name in result.stdout.strip().split(",") if name]
+    raise RuntimeError("No import time of YAML2ST in:\n" + result.stderr)
+
+
+def main():
+    argParser = argparse.ArgumentParser(description="Checks the import time of YAML2ST against a budget.")
+    argParser.add_argument('--budget', type=float, default=30.0, help="the most ms that importing YAML2ST may take")
+    argParser.add_argument('--repeat', type=int, default=5, help="imports to run; the fastest is kept")
+    args = argParser.parse_args()
+
+    importOnce() # Writes the bytecode cache so compiling the module isn't measured
+    runs = [importOnce() for _ in range(args.repeat)]
+    best = min(ms for ms, heavy in runs)
+    heavy = runs[0][1]
+    print("import YAML2ST: " + format(best, '.1f') + " ms (budget " + format(args.budget, '.1f') + " ms)")
+
+    failed = False
+    if heavy:
+        print("Loaded at import, instead of on first use: " + ", ".join(heavy))
+        failed = True
+    if best > args.budget:
+        print("Over budget by " + format(best - args.budget, '.1f') + " ms")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+# Checks cases of YAML layout that broke YAML2ST before, without Streamlit
+## Run: python app_test/regressions.py
+## Exits with 1 if a case fails.
+
+import os
+import sys
+import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app", "src"))
+import YAML2ST as y2s
+
+
+# The #FORCE directive after a block sequence is its next key's, in build() and in build(stream=True)
+FORCECASES = (
+    ("a:\n  f:\n    - 1\n    - 2\n  q: 5 #FORCE: w=slider | max_value=10\n", {'a > f': 'multiselect', 'a > q': 'slider'}),
+    ("f:\n  - x: 1\n    y: [2]\nq: 5 #FORCE: w=slider | max_value=10\n", {'f': 'multiselect', 'q': 'slider'}),
+    ("f:\n  - |\n    t\nq: 5 #FORCE: w=slider | max_value=10\n", {'f': 'multiselect', 'q': 'slider'}),
+    ("f:\n  - 1\n  - 2 #FORCE: w=multiselect | options=['1','2']\nq: 5 #FORCE: w=slider | max_value=10\n", {'f': 'multiselect', 'q': 'slider'}),
+)
+
+
+# The files of incremental exports with a value changed, as (file, breadcrumb, value). The patched file must parse to the change.
+PATCHCASES = (
+    ("a:\n  f:\n    - 1\n    - 2\n  q: 'x'\n", 'a > f', [1, 3]),
+    ("a:\n  f:\n    - 1\n    - 2\n  q: 'x'\n", 'a > q', 'y"z'),
+    ("f:\n  - 1\n  - 2\n\n# A comment\nq: 1\n", 'f', [3]),
+    ("f:\n  - x: 1\n    y: [2]\nq: 1\n", 'q', 2),
+    ("f: |\n  text\nq: 1\n", 'f', 'other'),
+    ("f:\n- 1\n- 2\r\nq: 1\r\n", 'f', [1, 3]),
+)
+
+
+# Returns the errors of the #FORCE cases
+def forceCases():
+    errors = []
+    for data, widgets in FORCECASES:
+        for stream in (False, True):
+            renderer = y2s.HeadlessRenderer()
+            y2s.build(data.encode("utf-8"), renderer, records=True, stream=stream)
+            drawn = {breadcrumb: entry['widget'] for breadcrumb, entry in renderer.manifest.items()}
+            if drawn != widgets:
+                errors.append("#FORCE" + (" streamed" if stream else "") + " of " + repr(data) + ": " + repr(drawn))
+    return errors
+
+
+# Returns the errors of the incremental export cases
+def patchCases():
+    import yaml
+    errors = []
+    for data, changed, value in PATCHCASES:
+        source = data.encode("utf-8")
+        rows = [(key, value if breadcrumb == changed else st_value, breadcrumb) for key, st_value, breadcrumb in y2s.buildHeadless(source)[0]]
+        patched = y2s.YAML2ST.patchExport(source, rows)
+        expected = yaml.safe_load(data)
+        node = expected
+        *parents, last = changed.split(" > ")
+        for key in parents:
+            node = node[key]
+        node[last] = value
+        try:
+            loaded = yaml.safe_load(patched)
+        except yaml.YAMLError as e:
+            loaded = "not YAML: " + str(e).splitlines()[0]
+        if loaded != expected:
+            errors.append("patchExport of " + repr(data) + " at " + changed + ": " + repr(patched) + " is " + repr(loaded))
+    return errors
+
+
+# Returns the errors of a change set of typed values, which must be JSON
+def changeSetCases():
+    import json
+    from decimal import Decimal
+    source = b"a: 0.10\nb: 2015-06-17\n"
+    rows = [('a', Decimal('0.25'), 'a'), ('b', datetime.date(2020, 1, 2), 'b')]
+    try:
+        text = json.dumps(y2s.YAML2ST.changeSet(source, rows))
+    except TypeError as e:
+        return ["changeSet isn't JSON: " + str(e)]
+    expected = '[{"op": "replace", "path": "/a", "value": 0.25}, {"op": "replace", "path": "/b", "value": "2020-01-02"}]'
+    return [] if text == expected else ["changeSet: " + text]
+
+
+def main():
+    errors = forceCases() + patchCases() + changeSetCases()
+    for error in errors:
+        print(error)
+    print(str(len(errors)) + " failed")
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+# Checks that a binary snapshot gives back the file it was made of: snapshotBytes() -> snapshotFromBuffer() -> toYAML()
+## Run: python app_test/snapshot_roundtrip.py
+## Exits with 1 if a snapshot's plan, rows, or YAML differ from those of the file it was made of.
+
+import os
+import sys
+import argparse
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "app", "src"))
+import YAML2ST as y2s
+from bench import SHAPES, genConfig
+
+
+# The configs to round trip: the test file, and each synthetic shape. Returns [(name, data)]
+def configs(size):
+    with open(os.path.join(HERE, "test.yaml"), "rb") as f:
+        found = [('test.yaml', f.read())]
+    for shape, (breadth, depth, commentDensity) in SHAPES.items():
+        data = genConfig(size, breadth, depth, commentDensity)
+        found.append((shape + '-' + str(size), data if isinstance(data, bytes) else data.encode("utf-8")))
+    return found
+
+
+# The rows of a file's default values with every 7th number changed, so the snapshot has values of its own
+def changedRows(data):
+    rows = y2s.buildHeadless(data)[0]
+    for row, (key, value, breadcrumb) in enumerate(rows):
+        if row % 7 == 0 and type(value) in (int, float):
+            rows[row] = (key, value + 1, breadcrumb)
+    return rows
+
+
+# The steps of a plan as text, so values that are equal but of other types, e.g. 1 and 1.0 or True, and kwargs in another order differ
+def planText(plan):
+    return [repr(tuple(step)) for step in plan]
+
+
+# Round trips one file. Returns the errors
+def roundTrip(data):
+    rows = changedRows(data)
+    plan = y2s.uploadToPlan(data, y2s.HeadlessRenderer())
+    snapshot = y2s.YAML2ST.snapshotFromBuffer(y2s.YAML2ST.snapshotBytes(data, rows))
+
+    errors = []
+    if planText(snapshot.plan) != planText(plan):
+        errors.append("plan")
+    if [repr(row) for row in snapshot.rows.records()] != [repr(row) for row in rows]:
+        errors.append("rows")
+    if snapshot.toYAML() != y2s.exportBytes(data, rows, "")[0]:
+        errors.append("toYAML")
+    return errors
+
+
+def main():
+    argParser = argparse.ArgumentParser(description="Round trips files through binary snapshots.")
+    argParser.add_argument('--size', type=int, default=2000, help="the keys of each synthetic config")
+    args = argParser.parse_args()
+
+    failed = False
+    for name, data in configs(args.size):
+        errors = roundTrip(data)
+        print(name + ": " + (", ".join(errors) + " differ" if errors else "ok"))
+        failed = failed or bool(errors)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()